@@ -0,0 +1,227 @@
+import ast
+import csv
+import json
+import queue
+import resource
+import time
+import traceback
+
+from displays import NoDisplay
+from game import BOARD_CLASSES, make_problem, draw_solution
+from pieces import PieceList
+import portfolio
+import processes
+
+"""
+Runs a manifest of Blokus puzzles headless and records how each search did.
+
+A manifest is a CSV file with a header row, or a JSONL file of objects, with
+one instance per row:
+- pieces: the layout file of the piece list, e.g. small_set.txt
+- size: the board size in the order of game.py's -s option, e.g. "10 10"
+- puzzle: fill, corners, cover, sub-optimal or mini-contest
+- start: the starting (row, col), e.g. "(0, 0)"; optional
+- targets: the (row, col) cells to cover, e.g. "[(2, 2), (5, 5)]"; for cover,
+  sub-optimal and mini-contest
+- search: a search function of portfolio.SEARCH_FUNCTIONS; not used by
+  sub-optimal and mini-contest, which solve themselves
+- heuristic: a heuristic for astar, idastar and smastar; optional
+- board: numpy, bitboard or tracked; optional
+In CSV files, start and targets are Python literals. An id column, if given,
+is copied to the results; otherwise the row number is used.
+
+Every instance runs in its own process (see processes.py), at most <jobs>
+at a time. A process that runs past the time limit is killed, and the memory
+limit caps the address space the search may add to what the process already
+uses.
+Each result is written as soon as its instance finishes, in the order they
+finish, with the columns in RESULT_FIELDS.
+"""
+
+RESULT_FIELDS = ['id', 'pieces', 'size', 'puzzle', 'start', 'targets', 'search', 'heuristic', 'status', 'cost',
+                 'expanded', 'wall_time', 'peak_rss_kb', 'error']
+
+# Result statuses
+SOLVED, NO_SOLUTION, TIMEOUT, OUT_OF_MEMORY, ERROR = 'solved', 'no_solution', 'timeout', 'out_of_memory', 'error'
+
+
+def _literal(value):
+    """
+    Returns a manifest value that may be a Python literal in a string as a Python value
+    """
+    if isinstance(value, str):
+        value = value.strip()
+        return ast.literal_eval(value) if value else None
+    return value
+
+
+def read_manifest(path):
+    """
+    Returns the instances of the manifest at <path> as a list of dicts, with size, start
+    and targets parsed
+    """
+    with open(path, newline='') as f:
+        if path.endswith('.jsonl'):
+            rows = [json.loads(line) for line in f if line.strip()]
+        else:
+            rows = list(csv.DictReader(f))
+    instances = []
+    for number, row in enumerate(rows):
+        size = row['size']
+        if isinstance(size, str):
+            size = [int(n) for n in size.replace(',', ' ').replace('x', ' ').split()]
+        targets = _literal(row.get('targets'))
+        instances.append({
+            'id': row['id'] if 'id' in row else number,
+            'pieces': row['pieces'],
+            'size': tuple(size),
+            'puzzle': row['puzzle'],
+            'start': tuple(_literal(row.get('start')) or (0, 0)),
+            'targets': None if targets is None else [tuple(target) for target in targets],
+            'search': row.get('search') or None,
+            'heuristic': row.get('heuristic') or None,
+            'board': row.get('board') or 'numpy',
+        })
+    return instances
+
+
+def solve(instance):
+    """
+    Builds and solves <instance> in this process, and returns (status, cost, expanded)
+    """
+    problem = make_problem(instance['puzzle'], instance['size'], PieceList(instance['pieces']),
+                           instance['start'], instance['targets'], BOARD_CLASSES[instance['board']])
+    if instance['puzzle'] in ('sub-optimal', 'mini-contest'):
+        back_trace = problem.solve()
+    else:
+        spec = instance['search']
+        if instance['heuristic'] is not None:
+            spec += ':' + instance['heuristic']
+        (_, search_func, heuristic), = portfolio.parse_strategies([spec])
+        back_trace = search_func(problem) if heuristic is None else search_func(problem, heuristic)
+    if back_trace is None or not portfolio.reaches_goal(problem, back_trace):
+        return NO_SOLUTION, None, problem.expanded
+    draw_solution(problem, back_trace, NoDisplay())
+    return SOLVED, problem.get_cost_of_actions(back_trace), problem.expanded
+
+
+def _run(number, instance, memory_limit, results):
+    if memory_limit is not None:
+        with open('/proc/self/statm') as f:
+            in_use = int(f.read().split()[0]) * resource.getpagesize()
+        limit = in_use + int(memory_limit * 2 ** 20)
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    start = time.perf_counter()
+    error = None
+    cost = expanded = None
+    try:
+        status, cost, expanded = solve(instance)
+    except MemoryError:
+        status = OUT_OF_MEMORY
+    except Exception:
+        status, error = ERROR, traceback.format_exc(limit=-1).strip().splitlines()[-1]
+    results.put({'number': number, 'status': status, 'cost': cost, 'expanded': expanded,
+                 'wall_time': time.perf_counter() - start,
+                 'peak_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, 'error': error})
+
+
+def run_batch(instances, jobs=1, time_limit=None, memory_limit=None):
+    """
+    Runs <instances> (see read_manifest), at most <jobs> at a time, each for at most
+    <time_limit> seconds and <memory_limit> megabytes (see the module docstring), and
+    yields the result of each, a dict with RESULT_FIELDS as keys, as it finishes.
+    """
+    context = processes.get_context()
+    results = context.Queue()
+    pending = list(enumerate(instances))[::-1]
+    running = {}  # position in instances: (instance, process, start time)
+    while pending or running:
+        while pending and len(running) < jobs:
+            number, instance = pending.pop()
+            process = context.Process(target=_run, args=(number, instance, memory_limit, results), daemon=True)
+            process.start()
+            running[number] = (instance, process, time.perf_counter())
+
+        finished = []
+        try:
+            finished.append(results.get(True, 0.05))
+        except queue.Empty:
+            pass
+        now = time.perf_counter()
+        for number, (instance, process, start) in running.items():
+            if time_limit is not None and now - start > time_limit:
+                process.kill()
+                finished.append({'number': number, 'status': TIMEOUT, 'wall_time': now - start})
+            elif process.exitcode is not None and results.empty():
+                # Allocations that fail in C code under the memory limit may crash the process
+                crashed = OUT_OF_MEMORY if memory_limit is not None and process.exitcode < 0 else ERROR
+                finished.append({'number': number, 'status': crashed, 'wall_time': now - start,
+                                 'error': 'exit code %d' % process.exitcode})
+
+        for result in finished:
+            entry = running.pop(result.pop('number'), None)
+            if entry is None:
+                continue  # killed, or it reported just as it was
+            instance, process, _ = entry
+            process.join()
+            row = dict.fromkeys(RESULT_FIELDS)
+            row.update((field, instance[field]) for field in RESULT_FIELDS if field in instance)
+            row.update(result)
+            yield row
+
+
+def _csv_value(value):
+    if isinstance(value, (tuple, list)):
+        return ' '.join(map(str, value)) if all(isinstance(item, int) for item in value) else str(value)
+    return '' if value is None else value
+
+
+def main():
+    """
+    Processes the command used to run a batch from the command line.
+    """
+    from optparse import OptionParser
+    usage_str = """
+    USAGE:      python batch.py <options> <manifest>
+    EXAMPLES:   (1) python batch.py -o results.csv puzzles.csv
+                    - runs every puzzle in puzzles.csv, one at a time, and writes results.csv
+                (2) python batch.py -j 4 -t 60 -m 2048 -o results.jsonl puzzles.jsonl
+                    - runs 4 at a time, each for at most 60 seconds and 2048 MB
+    """
+    parser = OptionParser(usage_str)
+    parser.add_option('-o', '--output', dest='output', default='results.csv',
+                      help='the results file, CSV or JSONL (by its extension)')
+    parser.add_option('-j', '--jobs', dest='jobs', type='int', default=1,
+                      help='the number of instances to run at a time')
+    parser.add_option('-t', '--time-limit', dest='time_limit', type='float', default=None,
+                      help='the seconds each instance may run for')
+    parser.add_option('-m', '--memory-limit', dest='memory_limit', type='float', default=None,
+                      help='the megabytes each instance may allocate')
+
+    options, args = parser.parse_args()
+    if len(args) != 1:
+        parser.error('expected one manifest file')
+    instances = read_manifest(args[0])
+
+    is_jsonl = options.output.endswith('.jsonl')
+    counts = {}
+    with open(options.output, 'w', newline='') as f:
+        writer = None if is_jsonl else csv.DictWriter(f, RESULT_FIELDS)
+        if writer is not None:
+            writer.writeheader()
+        for row in run_batch(instances, options.jobs, options.time_limit, options.memory_limit):
+            if is_jsonl:
+                f.write(json.dumps(row) + '\n')
+            else:
+                writer.writerow({field: _csv_value(value) for field, value in row.items()})
+            f.flush()
+            counts[row['status']] = counts.get(row['status'], 0) + 1
+            print("%-8s %-12s %-13s cost: %-5s expanded: %-8s %.2fs" % (row['id'], row['puzzle'], row['status'],
+                                                                        _csv_value(row['cost']),
+                                                                        _csv_value(row['expanded']),
+                                                                        row['wall_time']))
+    print(', '.join('%s: %d' % item for item in sorted(counts.items())))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,1001 @@
+"""
+Benchmarks for the Blokus engine and the search layer.
+
+Each benchmark prints one row per measured case. Timings are the best of
+several repeats, measured with time.perf_counter.
+"""
+
+import copy
+import json
+import math
+import multiprocessing
+import platform
+import random
+import resource
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from bitboard import BitBoard
+from blokus_problems import BlokusFillProblem, BlokusCornersProblem, BlokusCoverProblem, ClosestLocationSearch
+from blokus_problems import blokus_corners_heuristic, blokus_cover_heuristic
+from board import Board
+import eightpuzzle
+import parallel
+import pattern_db
+from pieces import PieceList
+from placements import PlacementIndex
+import search
+import simulate
+from trackedboard import TrackedBoard
+import util
+
+PIECE_FILES = ['valid_pieces.txt', 'small_set.txt', 'tiny_set.txt', 'tiny_set_2.txt']
+BOARD_SIZES = {'valid_pieces.txt': (20, 20), 'small_set.txt': (10, 10),
+               'tiny_set.txt': (5, 5), 'tiny_set_2.txt': (5, 5)}
+
+
+def best_time(func, repeat=5):
+    """
+    Call <func> <repeat> times and return (best wall time in seconds, last result)
+    """
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best, result
+
+
+def random_board(board_w, board_h, piece_list, num_moves, seed=0):
+    """
+    Returns a one-player board after <num_moves> random legal moves (fewer if
+    the player runs out of moves), chosen with a fixed <seed>.
+    """
+    rng = random.Random(seed)
+    board = Board(board_w, board_h, 1, piece_list)
+    for _ in range(num_moves):
+        moves = board.get_legal_moves(0)
+        if not moves:
+            break
+        board.add_move(0, moves[rng.randrange(len(moves))])
+    return board
+
+
+def _move_keys(moves):
+    return [(m.piece_index, m.x, m.y, m.orientation) for m in moves]
+
+
+def bench_legal_moves(repeat):
+    """
+    Compare get_legal_moves against the full scan on every shipped piece
+    set, at several fill levels.
+    """
+    print("%-18s %7s %6s %7s %10s %10s %8s" % ('pieces', 'size', 'moves', 'legal', 'scan ms', 'fast ms', 'speedup'))
+    for fname in PIECE_FILES:
+        piece_list = PieceList(fname)
+        board_w, board_h = BOARD_SIZES[fname]
+        for num_moves in (0, 2, 4, 8):
+            board = random_board(board_w, board_h, piece_list, num_moves)
+            scan_time, scan_moves = best_time(lambda: board.get_legal_moves_scan(0), repeat)
+            fast_time, fast_moves = best_time(lambda: board.get_legal_moves(0), repeat)
+            if _move_keys(scan_moves) != _move_keys(fast_moves):
+                raise AssertionError("get_legal_moves differs from the full scan on %s after %d moves"
+                                     % (fname, num_moves))
+            print("%-18s %7s %6d %7d %10.3f %10.3f %7.1fx" % (
+                fname, '%dx%d' % (board_w, board_h), num_moves, len(fast_moves),
+                scan_time * 1000, fast_time * 1000, scan_time / fast_time))
+
+
+def bench_placement_index(repeat):
+    """
+    Time building each PlacementIndex from scratch against loading it from
+    the disk cache.
+    """
+    print("%-18s %7s %10s %10s %10s" % ('pieces', 'size', 'placements', 'build ms', 'load ms'))
+    for fname in PIECE_FILES:
+        piece_list = PieceList(fname)
+        board_w, board_h = BOARD_SIZES[fname]
+        path = PlacementIndex._cache_path(board_w, board_h, piece_list)
+        build_time, index = best_time(lambda: PlacementIndex(board_w, board_h, piece_list), repeat)
+        index.save(path)
+        load_time, _ = best_time(lambda: PlacementIndex._load_or_build(board_w, board_h, piece_list), repeat)
+        print("%-18s %7s %10d %10.1f %10.1f" % (fname, '%dx%d' % (board_w, board_h), len(index),
+                                                build_time * 1000, load_time * 1000))
+
+
+def bench_board_backends(repeat):
+    """
+    Compare the numpy Board against the BitBoard by the number of nodes per
+    second uniform cost search expands on the fill problem.
+    """
+    print("%-18s %7s %-9s %9s %9s %11s" % ('pieces', 'size', 'board', 'expanded', 'time s', 'nodes/sec'))
+    for fname, (board_w, board_h) in (('tiny_set.txt', (5, 5)), ('tiny_set_2.txt', (5, 5))):
+        piece_list = PieceList(fname)
+        for name, board_class in (('numpy', Board), ('bitboard', BitBoard)):
+            problems = []
+
+            def run():
+                problem = BlokusFillProblem(board_w, board_h, piece_list, board_class=board_class)
+                problems.append(problem)
+                return search.ucs(problem)
+
+            elapsed, _ = best_time(run, repeat)
+            expanded = problems[-1].expanded
+            print("%-18s %7s %-9s %9d %9.3f %11.0f" % (fname, '%dx%d' % (board_w, board_h), name, expanded,
+                                                       elapsed, expanded / elapsed))
+
+
+def bench_in_place_dfs(repeat):
+    """
+    Compare depth_first_search against depth_first_search_in_place on fill
+    problems, by time and by peak memory allocated during the search.
+    """
+    print("%-18s %7s %-13s %9s %9s %10s" % ('pieces', 'size', 'search', 'expanded', 'time s', 'peak KiB'))
+    for fname, (board_w, board_h) in (('tiny_set.txt', (4, 7)), ('tiny_set_2.txt', (6, 6))):
+        piece_list = PieceList(fname)
+        for name in ('dfs', 'dfs_in_place'):
+            search_func = getattr(search, name)
+            problem = BlokusFillProblem(board_w, board_h, piece_list)
+            elapsed, _ = best_time(lambda: search_func(BlokusFillProblem(board_w, board_h, piece_list)), repeat)
+            tracemalloc.start()
+            search_func(problem)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            print("%-18s %7s %-13s %9d %9.3f %10.0f" % (fname, '%dx%d' % (board_w, board_h), name,
+                                                        problem.expanded, elapsed, peak / 1024.0))
+
+
+class EagerProblem(object):
+    """
+    Wraps a search problem so that only get_successors is visible, to compare
+    the searches with and without the lazy successor protocol.
+    """
+
+    hidden = ('get_actions', 'get_successor', 'apply_action', 'undo_action')
+
+    def __init__(self, problem):
+        self.problem = problem
+
+    def __getattr__(self, name):
+        if name in EagerProblem.hidden:
+            raise AttributeError(name)
+        return getattr(self.problem, name)
+
+
+def search_instances():
+    """
+    Returns (name, problem factory, search function) triples for the fixed
+    corners and cover instances the search benchmarks run on.
+    """
+    small_set = PieceList('small_set.txt')
+    tiny_set_2 = PieceList('tiny_set_2.txt')
+    return [
+        ('corners 5x5 ucs', lambda: BlokusCornersProblem(5, 5, tiny_set_2), search.ucs),
+        ('corners 5x5 astar', lambda: BlokusCornersProblem(5, 5, tiny_set_2),
+         lambda p: search.astar(p, blokus_corners_heuristic)),
+        ('cover 8x8 astar', lambda: BlokusCoverProblem(8, 8, small_set, (3, 3), [(2, 2), (5, 5), (6, 7)]),
+         lambda p: search.astar(p, blokus_cover_heuristic)),
+    ]
+
+
+def bench_lazy_successors(repeat):
+    """
+    Compare eager get_successors against the lazy successor protocol on the
+    corners and cover instances, by time and peak memory.
+    """
+    print("%-20s %-6s %6s %9s %9s %10s" % ('instance', 'mode', 'cost', 'expanded', 'time s', 'peak KiB'))
+    for name, make_problem, search_func in search_instances():
+        for mode in ('eager', 'lazy'):
+            wrap = EagerProblem if mode == 'eager' else (lambda p: p)
+            problems = []
+
+            def run():
+                problems.append(make_problem())
+                return search_func(wrap(problems[-1]))
+
+            elapsed, actions = best_time(run, repeat)
+            tracemalloc.start()
+            search_func(wrap(make_problem()))
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            print("%-20s %-6s %6d %9d %9.3f %10.0f" % (name, mode, problems[-1].get_cost_of_actions(actions),
+                                                       problems[-1].expanded, elapsed, peak / 1024.0))
+
+
+class ExpansionLimit(Exception):
+    pass
+
+
+class CappedProblem(object):
+    """
+    Wraps a search problem so that expanding more than <limit> nodes raises
+    ExpansionLimit, to measure searches that would run for too long.
+    """
+
+    def __init__(self, problem, limit):
+        self.problem = problem
+        self.limit = limit
+
+    def __getattr__(self, name):
+        return getattr(self.problem, name)
+
+    def _check(self):
+        if self.problem.expanded >= self.limit:
+            raise ExpansionLimit()
+
+    def get_actions(self, state):
+        self._check()
+        return self.problem.get_actions(state)
+
+    def get_successors(self, state):
+        self._check()
+        return self.problem.get_successors(state)
+
+
+def _run_in_child(func, conn):
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    conn.send((elapsed, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - before, result))
+    conn.close()
+
+
+def peak_rss_growth(func):
+    """
+    Call <func> in a forked process and return (wall time in seconds, growth
+    of the peak RSS in KiB, result). The result must be picklable.
+    """
+    context = multiprocessing.get_context('fork')
+    parent_conn, child_conn = context.Pipe(duplex=False)
+    process = context.Process(target=_run_in_child, args=(func, child_conn))
+    process.start()
+    result = parent_conn.recv()
+    process.join()
+    return result
+
+
+def bench_node_store(repeat):
+    """
+    Peak RSS of bfs, ucs and astar on the cover example from game.py's usage
+    string (14x14, all pieces, targets (1, 1), (5, 9), (9, 6)), stopped after
+    a fixed number of expansions since a full search takes far too long.
+    """
+    piece_list = PieceList('valid_pieces.txt')
+    targets = [(1, 1), (5, 9), (9, 6)]
+    print("%-8s %9s %9s %13s" % ('search', 'expanded', 'time s', 'peak RSS MiB'))
+    for name in ('bfs', 'ucs', 'astar'):
+        search_func = getattr(search, name)
+        problem = BlokusCoverProblem(14, 14, piece_list, (0, 0), targets)
+        problem.get_start_state().get_legal_moves(0)  # build the placement index outside the measurement
+
+        def run():
+            try:
+                search_func(CappedProblem(problem, 3000))
+            except ExpansionLimit:
+                pass
+            return problem.expanded
+
+        elapsed, growth, expanded = peak_rss_growth(run)
+        print("%-8s %9d %9.3f %13.1f" % (name, expanded, elapsed, growth / 1024.0))
+
+
+def bench_tie_breaks(repeat):
+    """
+    Compare a_star_search's tie-break policies by expanded nodes and time on
+    corners and cover instances.
+    """
+    small_set = PieceList('small_set.txt')
+    tiny_set_2 = PieceList('tiny_set_2.txt')
+    instances = [
+        ('corners 5x5', lambda: BlokusCornersProblem(5, 5, tiny_set_2), blokus_corners_heuristic),
+        ('corners 6x6', lambda: BlokusCornersProblem(6, 6, tiny_set_2), blokus_corners_heuristic),
+        ('cover 8x8', lambda: BlokusCoverProblem(8, 8, small_set, (3, 3), [(2, 2), (5, 5), (6, 7)]),
+         blokus_cover_heuristic),
+        ('cover 7x7', lambda: BlokusCoverProblem(7, 7, small_set, (3, 3), [(1, 1), (5, 5)]),
+         blokus_cover_heuristic),
+    ]
+    print("%-14s %-9s %6s %9s %9s" % ('instance', 'tie-break', 'cost', 'expanded', 'time s'))
+    for name, make_problem, heuristic in instances:
+        for tie_break in search.TIE_BREAKS:
+            problems = []
+
+            def run():
+                problems.append(make_problem())
+                return search.astar(problems[-1], heuristic, tie_break)
+
+            elapsed, actions = best_time(run, repeat)
+            print("%-14s %-9s %6d %9d %9.3f" % (name, tie_break, problems[-1].get_cost_of_actions(actions),
+                                               problems[-1].expanded, elapsed))
+
+
+def random_eight_puzzles(count, moves, seed=0):
+    """
+    Returns <count> eight puzzles, each <moves> random moves from the goal
+    """
+    random.seed(seed)
+    return [eightpuzzle.createRandomEightPuzzle(moves) for _ in range(count)]
+
+
+def bench_queues(repeat):
+    """
+    Time the FIFO and priority queues in util.py on their own, then bfs, ucs
+    and astar on random eight puzzles and on Blokus fill problems.
+    """
+    size = 200000
+    print("%-22s %9s %12s" % ('queue', 'items', 'ops/sec'))
+
+    def fifo_list():
+        fringe = []
+        for i in range(size):
+            fringe.append(i)
+        while len(fringe):
+            fringe.pop(0)
+
+    def fifo_deque():
+        fringe = util.Queue()
+        for i in range(size):
+            fringe.push(i)
+        while not fringe.isEmpty():
+            fringe.pop()
+
+    def heap(queue_class):
+        def run():
+            rng = random.Random(0)
+            fringe = queue_class()
+            for i in range(size):
+                fringe.push(i, rng.random())
+            while not fringe.isEmpty():
+                fringe.pop()
+        return run
+
+    def decrease_key():
+        rng = random.Random(0)
+        fringe = util.IndexedPriorityQueue()
+        for i in range(size):
+            fringe.push(i, rng.random())
+        for i in range(size):
+            fringe.update(rng.randrange(size), rng.random() - 1)
+        while not fringe.isEmpty():
+            fringe.pop()
+
+    for name, func in (('list.pop(0)', fifo_list), ('util.Queue', fifo_deque),
+                       ('PriorityQueue', heap(util.PriorityQueue)),
+                       ('IndexedPriorityQueue', heap(util.IndexedPriorityQueue)),
+                       ('  + update', decrease_key)):
+        elapsed, _ = best_time(func, 1 if name == 'list.pop(0)' else repeat)
+        print("%-22s %9d %12.0f" % (name, size, 2 * size / elapsed))
+
+    print()
+    print("%-26s %-6s %9s %9s" % ('instance', 'search', 'cost', 'time s'))
+    puzzles = random_eight_puzzles(10, 30)
+    for name in ('bfs', 'ucs', 'astar'):
+        search_func = getattr(search, name)
+        problems = [eightpuzzle.EightPuzzleSearchProblem(puzzle) for puzzle in puzzles]
+        elapsed, paths = best_time(lambda: [search_func(problem) for problem in problems], repeat)
+        print("%-26s %-6s %9d %9.3f" % ('eightpuzzle x10 (30 moves)', name, sum(len(path) for path in paths),
+                                        elapsed))
+    piece_list = PieceList('tiny_set.txt')
+    for name in ('bfs', 'ucs'):
+        search_func = getattr(search, name)
+        elapsed, path = best_time(lambda: search_func(BlokusFillProblem(6, 6, piece_list)), repeat)
+        print("%-26s %-6s %9d %9.3f" % ('fill 6x6 tiny_set', name, len(path), elapsed))
+
+
+def _nested_loop_distance(board, target):
+    """
+    ClosestLocationSearch.distance_to_target as it was, scanning every cell
+    """
+    best_dist = math.inf
+    for x in range(board.board_w):
+        for y in range(board.board_h):
+            if board.state[x][y] == 0:
+                best_dist = min(best_dist, abs(target[0] - x) + abs(target[1] - y))
+    return best_dist
+
+
+def bench_hash_distributed(repeat):
+    """
+    Run hash_distributed_a_star_search with 1 up to cpu_count() workers
+    against a_star_search on the same instances: a Blokus cover problem and
+    random eight puzzles with the pattern database heuristic. The speedup is
+    the A* time over the HDA* time.
+    """
+    small_set = PieceList('small_set.txt')
+    puzzles = random_eight_puzzles(5, 60)
+    instances = [
+        ('cover 10x10', lambda: [BlokusCoverProblem(10, 10, small_set, (3, 3), [(2, 2), (5, 5), (6, 7)])],
+         blokus_cover_heuristic),
+        ('eightpuzzle x5', lambda: [eightpuzzle.EightPuzzleSearchProblem(puzzle) for puzzle in puzzles],
+         pattern_db.eight_puzzle_pdb_heuristic),
+    ]
+    print("%-15s %-8s %6s %9s %9s %8s" % ('instance', 'search', 'cost', 'expanded', 'time s', 'speedup'))
+    for name, make_problems, heuristic in instances:
+        searches = [('astar', search.astar)]
+        searches += [('hda*%d' % n, lambda problem, h, n=n: search.hdastar(problem, h, n))
+                     for n in range(1, multiprocessing.cpu_count() + 1)]
+        astar_time = None
+        for search_name, search_func in searches:
+            def run():
+                problems = make_problems()
+                cost = sum(problem.get_cost_of_actions(search_func(problem, heuristic)) for problem in problems)
+                return cost, sum(getattr(problem, 'expanded', 0) for problem in problems)
+
+            elapsed, (cost, expanded) = best_time(run, repeat)
+            astar_time = astar_time or elapsed
+            print("%-15s %-8s %6d %9d %9.3f %8.2f" % (name, search_name, cost, expanded, elapsed,
+                                                     astar_time / elapsed))
+
+
+def bench_tracked_games(repeat):
+    """
+    Play full seeded four-player random games (see simulate.play_game) on
+    every board class, the TrackedBoard keeping its legal placements up to
+    date between moves and the others finding them again on every call. The
+    speedup is the numpy Board's time over each board's. Each board class
+    plays a game before it's timed, so none of them pays for building the
+    placement tables in its time.
+    """
+    games = 5
+    print("%-18s %7s %-9s %6s %9s %9s %8s" % ('pieces', 'size', 'board', 'moves', 'time s', 'games/s', 'speedup'))
+    for fname in ('valid_pieces.txt', 'small_set.txt'):
+        piece_list = PieceList(fname)
+        board_w, board_h = BOARD_SIZES[fname]
+        board_time = None
+        results = None
+        for name, board_class in (('numpy', Board), ('bitboard', BitBoard), ('tracked', TrackedBoard)):
+            # Untimed, to build the tables the class shares between boards
+            simulate.play_game(0, board_w, board_h, piece_list, board_class)
+            elapsed, played = best_time(lambda: [simulate.play_game(seed, board_w, board_h, piece_list, board_class)
+                                                 for seed in range(games)], repeat)
+            if results is not None and played != results:
+                raise AssertionError("%s played different games on %s" % (name, fname))
+            results = played
+            board_time = board_time or elapsed
+            print("%-18s %7s %-9s %6d %9.3f %9.1f %7.2fx" % (fname, '%dx%d' % (board_w, board_h), name,
+                                                            sum(moves for _, moves in played), elapsed,
+                                                            games / elapsed, board_time / elapsed))
+
+
+def bench_parallel_moves(repeat):
+    """
+    Legal move generation on 20x20 boards with valid_pieces.txt, in this
+    process and with a ParallelMoveGenerator of 1 up to cpu_count() workers.
+    """
+    piece_list = PieceList('valid_pieces.txt')
+    boards = [(num_moves, random_board(20, 20, piece_list, num_moves)) for num_moves in (0, 4, 10)]
+    calls = 20
+    print("%-8s %-6s %7s %11s" % ('workers', 'moves', 'legal', 'calls/sec'))
+    for num_moves, board in boards:
+        elapsed, moves = best_time(lambda: [board.get_legal_moves(0) for _ in range(calls)][-1], repeat)
+        print("%-8s %-6d %7d %11.1f" % ('serial', num_moves, len(moves), calls / elapsed))
+    for num_workers in range(1, multiprocessing.cpu_count() + 1):
+        generator = parallel.ParallelMoveGenerator(boards[0][1], num_workers)
+        try:
+            for num_moves, board in boards:
+                elapsed, moves = best_time(lambda: [generator.legal_moves(board, 0) for _ in range(calls)][-1],
+                                           repeat)
+                print("%-8d %-6d %7d %11.1f" % (num_workers, num_moves, len(moves), calls / elapsed))
+        finally:
+            generator.close()
+
+
+def bench_memoized_heuristic(repeat):
+    """
+    Time A* and IDA* with blokus_cover_heuristic as it is and wrapped in a
+    MemoizedHeuristic, with the cache's hits and misses.
+    """
+    small_set = PieceList('small_set.txt')
+
+    def make_problem():
+        return BlokusCoverProblem(8, 8, small_set, (3, 3), [(2, 2), (5, 5), (6, 7)])
+
+    print("%-8s %-10s %9s %9s %9s %9s" % ('search', 'heuristic', 'expanded', 'hits', 'misses', 'time s'))
+    for search_name in ('astar', 'idastar'):
+        search_func = getattr(search, search_name)
+        for memoized in (False, True):
+            def run():
+                problem = make_problem()
+                heuristic = search.MemoizedHeuristic(blokus_cover_heuristic) if memoized else blokus_cover_heuristic
+                search_func(problem, heuristic)
+                return problem.expanded, heuristic
+
+            elapsed, (expanded, heuristic) = best_time(run, repeat)
+            print("%-8s %-10s %9d %9s %9s %9.3f" % (search_name, 'memoized' if memoized else 'plain', expanded,
+                                                    heuristic.hits if memoized else '-',
+                                                    heuristic.misses if memoized else '-', elapsed))
+
+
+def bench_distance_field(repeat):
+    """
+    Time Board.distance_field on its own and in blokus_cover_heuristic, and
+    ClosestLocationSearch.distance_to_target against the nested loops it
+    replaced, on 20x20 boards after a few random moves.
+    """
+    piece_list = PieceList('valid_pieces.txt')
+    targets = [(19, 19), (10, 2), (3, 15)]
+    problem = ClosestLocationSearch(20, 20, piece_list, (0, 0), targets)
+    heuristic_problem = BlokusCoverProblem(20, 20, piece_list, (0, 0), targets)
+    calls = 200
+    print("%-6s %-34s %12s" % ('moves', 'function', 'calls/sec'))
+    for num_moves in (1, 4, 8):
+        board = random_board(20, 20, piece_list, num_moves)
+        functions = [
+            ('distance_field', lambda: board.distance_field(0)),
+            ('distance_field (targets)', lambda: board.distance_field(0, targets)),
+            ('blokus_cover_heuristic', lambda: blokus_cover_heuristic(board, heuristic_problem)),
+            ('distance_to_target (nested loops)', lambda: [_nested_loop_distance(board, t) for t in targets]),
+            ('distance_to_target', lambda: [problem.distance_to_target(t, board) for t in targets]),
+        ]
+        for name, function in functions:
+            elapsed, _ = best_time(lambda: [function() for _ in range(calls)], repeat)
+            print("%-6d %-34s %12.0f" % (num_moves, name, calls / elapsed))
+
+
+def bench_pattern_db(repeat):
+    """
+    Compare the hand-written heuristics with the pattern database ones: A*
+    expansions and time on Blokus cover problems and random eight puzzles,
+    and how long building and loading the tables takes.
+    """
+    small_set = PieceList('small_set.txt')
+    print("%-22s %-26s %6s %9s %9s" % ('instance', 'heuristic', 'cost', 'expanded', 'time s'))
+    instances = [
+        ('cover 8x8', lambda: BlokusCoverProblem(8, 8, small_set, (3, 3), [(2, 2), (5, 5), (6, 7)])),
+        ('cover 10x10', lambda: BlokusCoverProblem(10, 10, small_set, (0, 0), [(3, 3), (6, 6)])),
+    ]
+    for name, make_problem in instances:
+        for heuristic in (blokus_cover_heuristic, pattern_db.blokus_cover_pdb_heuristic):
+            def run():
+                problem = make_problem()
+                actions = search.astar(problem, heuristic)
+                return problem.get_cost_of_actions(actions), problem.expanded
+
+            elapsed, (cost, expanded) = best_time(run, repeat)
+            print("%-22s %-26s %6d %9d %9.3f" % (name, heuristic.__name__, cost, expanded, elapsed))
+
+    puzzles = random_eight_puzzles(20, 100)
+    for heuristic in (search.null_heuristic, pattern_db.eight_puzzle_pdb_heuristic):
+        def run():
+            problems = [eightpuzzle.PackedEightPuzzleSearchProblem(puzzle) for puzzle in puzzles]
+            return [search.astar(problem, heuristic) for problem in problems]
+
+        elapsed, paths = best_time(run, repeat)
+        print("%-22s %-26s %6d %9s %9.3f" % ('eightpuzzle x20', heuristic.__name__,
+                                            sum(len(path) for path in paths), '-', elapsed))
+
+    start = time.perf_counter()
+    pattern_db.build_cover_table(14, 14, PieceList('valid_pieces.txt'))
+    print("build cover table 14x14 valid_pieces: %.3f s" % (time.perf_counter() - start))
+    start = time.perf_counter()
+    for pattern in pattern_db.EIGHT_PUZZLE_PATTERNS:
+        pattern_db.build_eight_puzzle_table(pattern)
+    print("build eight puzzle tables: %.3f s" % (time.perf_counter() - start))
+
+
+def bench_eight_puzzle(repeat):
+    """
+    Solves/sec of bfs and bidirectional bfs on random eight puzzles, with the
+    list-of-lists states and with packed int states.
+    """
+    puzzles = random_eight_puzzles(10, 30)
+    print("%-8s %-6s %9s %12s" % ('states', 'search', 'moves', 'solves/sec'))
+    for name, problem_class in (('lists', eightpuzzle.EightPuzzleSearchProblem),
+                                ('packed', eightpuzzle.PackedEightPuzzleSearchProblem)):
+        for search_name in ('bfs', 'bibfs'):
+            search_func = getattr(search, search_name)
+            elapsed, paths = best_time(lambda: [search_func(problem_class(puzzle)) for puzzle in puzzles], repeat)
+            print("%-8s %-6s %9d %12.1f" % (name, search_name, sum(len(path) for path in paths),
+                                            len(puzzles) / elapsed))
+    random.seed(0)
+    eightpuzzle.batchSolve(1000, 100)
+
+
+def bench_idastar(repeat):
+    """
+    Compare a_star_search against iterative_deepening_a_star_search by
+    expanded nodes, time and peak RSS (of a forked run).
+    """
+    small_set = PieceList('small_set.txt')
+    tiny_set_2 = PieceList('tiny_set_2.txt')
+    instances = [
+        ('corners 6x6', lambda: BlokusCornersProblem(6, 6, tiny_set_2), blokus_corners_heuristic),
+        ('cover 8x8', lambda: BlokusCoverProblem(8, 8, small_set, (3, 3), [(2, 2), (5, 5), (6, 7)]),
+         blokus_cover_heuristic),
+        ('cover 10x10', lambda: BlokusCoverProblem(10, 10, small_set, (0, 0), [(3, 3), (6, 6)]),
+         blokus_cover_heuristic),
+    ]
+    print("%-14s %-8s %6s %9s %9s %13s" % ('instance', 'search', 'cost', 'expanded', 'time s', 'peak RSS MiB'))
+    for name, make_problem, heuristic in instances:
+        for search_name in ('astar', 'idastar'):
+            search_func = getattr(search, search_name)
+
+            def run():
+                problem = make_problem()
+                actions = search_func(problem, heuristic)
+                return problem.get_cost_of_actions(actions), problem.expanded
+
+            elapsed, growth, (cost, expanded) = peak_rss_growth(run)
+            print("%-14s %-8s %6d %9d %9.3f %13.1f" % (name, search_name, cost, expanded, elapsed, growth / 1024.0))
+
+
+def _remaining_pieces_heuristic(state, problem):
+    """
+    The number of pieces left to place: admissible (and exact) for the fill
+    problem, where every move places one piece at cost 1. It stands in for
+    the bigPieceHuristic layouts/Problem_set.txt was run with.
+    """
+    return int(state.pieces[0].sum())
+
+
+def problem_set_instances():
+    """
+    Returns (name, make_problem, heuristic, budgets) for the instances of
+    layouts/Problem_set.txt, with the smastar node budgets to try on each
+    """
+    small_set = PieceList('small_set.txt')
+    instances = [('cover 8x8', lambda: BlokusCoverProblem(8, 8, small_set, (3, 3), [(2, 2), (5, 5), (6, 7)]),
+                  blokus_cover_heuristic, (20000, 5000, 2000))]
+    for size in (20, 13, 11):
+        instances.append(('fill %dx%d' % (size, size), lambda size=size: BlokusFillProblem(size, size, small_set),
+                          _remaining_pieces_heuristic, (2000, 500, 100)))
+    return instances
+
+
+def bench_sma_star(repeat):
+    """
+    Run simplified_memory_bounded_a_star_search with shrinking node budgets
+    on the instances of layouts/Problem_set.txt, to size --max-nodes: cost,
+    expanded, forgotten and regenerated nodes, time and peak RSS (of a
+    forked run), with a_star_search for reference.
+    """
+    print("%-10s %-8s %8s %6s %9s %10s %11s %9s %13s" % ('instance', 'search', 'budget', 'cost', 'expanded',
+                                                         'forgotten', 'regenerated', 'time s', 'peak RSS MiB'))
+    for name, make_problem, heuristic, budgets in problem_set_instances():
+        for max_nodes in (None,) + budgets:
+            def run():
+                problem = make_problem()
+                if max_nodes is None:
+                    actions = search.astar(problem, heuristic)
+                    return problem.get_cost_of_actions(actions), problem.expanded, 0, 0
+                actions = search.smastar(problem, heuristic, max_nodes=max_nodes)
+                cost = -1 if actions is None else problem.get_cost_of_actions(actions)
+                return cost, problem.expanded, problem.forgotten, problem.regenerated
+
+            elapsed, growth, (cost, expanded, forgotten, regenerated) = peak_rss_growth(run)
+            print("%-10s %-8s %8s %6d %9d %10d %11d %9.3f %13.1f" % (
+                name, 'astar' if max_nodes is None else 'smastar', max_nodes or '-', cost, expanded, forgotten,
+                regenerated, elapsed, growth / 1024.0))
+
+
+def _bytes_state_key(state):
+    return state.state.tobytes() + state.pieces.tobytes()
+
+
+def generated_boards(board, limit):
+    """
+    Returns up to <limit> boards in the order a breadth first search generates
+    them from <board>, duplicates included.
+    """
+    boards = []
+    frontier = [board]
+    while frontier and len(boards) < limit:
+        state = frontier.pop(0)
+        for move in state.get_legal_moves(0):
+            child = state.do_move(0, move)
+            boards.append(child)
+            frontier.append(child)
+            if len(boards) == limit:
+                break
+    return boards
+
+
+def bench_visited_set(repeat):
+    """
+    Compare the bytes state keys the search loops used to hash against
+    BlokusSearchProblem.get_state_key, which carries the Zobrist hash:
+    visited-set throughput, key building included, on the boards breadth first
+    search generates, and whole breadth_first_search runs.
+    """
+    print("%-18s %7s %-9s %8s %8s %12s %9s" % ('pieces', 'size', 'key', 'boards', 'unique', 'lookups/sec',
+                                              'bfs s'))
+    for fname, (board_w, board_h) in (('tiny_set.txt', (5, 5)), ('small_set.txt', (8, 8))):
+        piece_list = PieceList(fname)
+        boards = generated_boards(Board(board_w, board_h, 1, piece_list), 5000)
+        problem = BlokusFillProblem(board_w, board_h, piece_list)
+        for name, get_state_key in (('bytes', _bytes_state_key), ('zobrist', problem.get_state_key)):
+            def fill_visited():
+                visited = set()
+                for board in boards:
+                    key = get_state_key(board)
+                    if key not in visited:
+                        visited.add(key)
+                return len(visited)
+
+            elapsed, unique = best_time(fill_visited, repeat)
+
+            bfs_time = '-'
+            if fname == 'tiny_set.txt':
+                def run_bfs():
+                    bfs_problem = BlokusFillProblem(board_w, board_h, piece_list)
+                    if name == 'bytes':
+                        bfs_problem.get_state_key = _bytes_state_key
+                    return search.bfs(bfs_problem)
+
+                elapsed_bfs, _ = best_time(run_bfs, repeat)
+                bfs_time = '%.3f' % elapsed_bfs
+            print("%-18s %7s %-9s %8d %8d %12.0f %9s" % (fname, '%dx%d' % (board_w, board_h), name, len(boards),
+                                                          unique, len(boards) / elapsed, bfs_time))
+
+
+def bench_symmetry(repeat):
+    """
+    Compare searches with and without symmetry reduction, by expanded nodes,
+    time, and the cost of one get_state_key call on the boards breadth first
+    search generates. The instances have symmetric goals and starting points.
+    """
+    tiny_set = PieceList('tiny_set.txt')
+    tiny_set_2 = PieceList('tiny_set_2.txt')
+    small_set = PieceList('small_set.txt')
+    instances = [
+        ('fill 5x5 ucs', lambda: BlokusFillProblem(5, 5, tiny_set), search.ucs),
+        ('fill 6x6 bfs', lambda: BlokusFillProblem(6, 6, tiny_set), search.bfs),
+        ('corners 5x5 ucs', lambda: BlokusCornersProblem(5, 5, tiny_set_2), search.ucs),
+        ('corners 5x5 astar', lambda: BlokusCornersProblem(5, 5, tiny_set_2),
+         lambda p: search.astar(p, blokus_corners_heuristic)),
+        ('cover 7x7 astar', lambda: BlokusCoverProblem(7, 7, small_set, (3, 3), [(1, 1), (5, 5)]),
+         lambda p: search.astar(p, blokus_cover_heuristic)),
+    ]
+    print("%-20s %-6s %10s %6s %9s %9s %8s" % ('instance', 'reduce', 'symmetries', 'cost', 'expanded', 'time s',
+                                              'key ns'))
+    for name, make_problem, search_func in instances:
+        for reduce in (False, True):
+            problems = []
+
+            def run():
+                problems.append(make_problem())
+                if reduce:
+                    problems[-1].enable_symmetry_reduction()
+                return search_func(problems[-1])
+
+            elapsed, actions = best_time(run, repeat)
+            problem = problems[-1]
+            num_symmetries = len(problem.symmetries) if problem.symmetries else 1
+            boards = generated_boards(problem.board, 2000)
+            elapsed_keys, _ = best_time(lambda: [problem.get_state_key(board) for board in boards], repeat)
+            print("%-20s %-6s %10d %6d %9d %9.3f %8.0f" % (name, 'yes' if reduce else 'no', num_symmetries,
+                                                          problem.get_cost_of_actions(actions), problem.expanded,
+                                                          elapsed, elapsed_keys / len(boards) * 1e9))
+
+
+def _mask_legal_moves(board, player):
+    """
+    Legal moves from one legal_placement_mask call per orientation of every
+    available piece
+    """
+    index = board.placements
+    _, _, _, orientation_start, pid_grid = index.mask_tables()
+    pids = []
+    for piece_index in np.flatnonzero(board.pieces[player]).tolist():
+        for orientation in range(len(list(board.piece_list.pieces[piece_index]))):
+            mask = board.legal_placement_mask(player, piece_index, orientation)
+            pids.extend(pid_grid[orientation_start[piece_index] + orientation][mask].tolist())
+    return [index.moves[pid] for pid in sorted(pids)]
+
+
+def bench_placement_masks(repeat):
+    """
+    Compare get_legal_moves's two move generators, the anchor lookup and the
+    shifted-array masks, with one legal_placement_mask call per orientation
+    and with get_legal_moves itself, which picks one of the two, on every
+    shipped piece set from the opening to the endgame.
+    """
+    print("%-18s %7s %6s %7s %10s %10s %10s %10s" % ('pieces', 'size', 'moves', 'legal', 'anchor ms', 'loop ms',
+                                                    'masks ms', 'chosen ms'))
+    for fname in PIECE_FILES:
+        piece_list = PieceList(fname)
+        board_w, board_h = BOARD_SIZES[fname]
+        for num_moves in (0, 4, 10, 20):
+            board = random_board(board_w, board_h, piece_list, num_moves)
+            anchors = np.flatnonzero(board.connected[0] & board._legal[0])
+            if len(anchors) == 0:
+                continue  # the player is out of moves: there is nothing to generate
+            available = np.flatnonzero(board.pieces[0][board.placements.mask_tables()[2]])
+            anchor_time, anchor_ids = best_time(lambda: board._legal_ids_at_anchors(0, anchors), repeat)
+            loop_time, loop_moves = best_time(lambda: _mask_legal_moves(board, 0), repeat)
+            masks_time, masks_ids = best_time(lambda: board._legal_ids_by_masks(0, available), repeat)
+            anchor_moves = [board.placements.moves[pid] for pid in anchor_ids.tolist()]
+            masks_moves = [board.placements.moves[pid] for pid in masks_ids.tolist()]
+            chosen_time, chosen_moves = best_time(lambda: board.get_legal_moves(0), repeat)
+            if not (_move_keys(anchor_moves) == _move_keys(loop_moves) == _move_keys(masks_moves)
+                    == _move_keys(chosen_moves)):
+                raise AssertionError("the move generators differ on %s after %d moves" % (fname, num_moves))
+            print("%-18s %7s %6d %7d %10.3f %10.3f %10.3f %10.3f" % (
+                fname, '%dx%d' % (board_w, board_h), num_moves, len(chosen_moves), anchor_time * 1000,
+                loop_time * 1000, masks_time * 1000, chosen_time * 1000))
+
+
+def suite_cases():
+    """
+    Returns (name, func, calls) triples for the engine hot paths the baseline
+    tracks: get_legal_moves at several fill levels, do_move, __copy__,
+    __hash__, __eq__ and key() of a board, loading each shipped piece list,
+    and complete searches on fixed fill, corners and cover instances. A case
+    is timed over <calls> calls of func.
+    """
+    cases = []
+    for fname, fills in (('valid_pieces.txt', (0, 4, 10)), ('small_set.txt', (0, 3, 6))):
+        piece_list = PieceList(fname)
+        board_w, board_h = BOARD_SIZES[fname]
+        for num_moves in fills:
+            board = random_board(board_w, board_h, piece_list, num_moves)
+            cases.append(('get_legal_moves %s %d moves' % (fname, num_moves),
+                          lambda board=board: board.get_legal_moves(0), 20))
+
+    board = random_board(20, 20, PieceList('valid_pieces.txt'), 4)
+    move = board.get_legal_moves(0)[0]
+    other = copy.copy(board)
+    cases += [
+        ('do_move', lambda: board.do_move(0, move), 200),
+        ('__copy__', lambda: copy.copy(board), 200),
+        ('__hash__', lambda: hash(board), 10000),
+        ('__eq__', lambda: board == other, 2000),
+        ('key', lambda: board.key(), 2000),
+    ]
+    for fname in PIECE_FILES:
+        cases.append(('load %s' % fname, lambda fname=fname: PieceList(fname), 5))
+
+    tiny_set = PieceList('tiny_set.txt')
+    instances = [('fill 4x7 ucs', lambda: BlokusFillProblem(4, 7, tiny_set), search.ucs)] + search_instances()
+    for name, make_problem, search_func in instances:
+        cases.append(('search %s' % name, lambda make_problem=make_problem, search_func=search_func:
+                      search_func(make_problem()), 1))
+    return cases
+
+
+def run_suite(repeat):
+    """
+    Times every case of suite_cases and returns a dict mapping each case's
+    name to its best time per call, in seconds
+    """
+    results = {}
+    for name, func, calls in suite_cases():
+        def run():
+            for _ in range(calls):
+                func()
+
+        elapsed, _ = best_time(run, repeat)
+        results[name] = elapsed / calls
+    return results
+
+
+def bench_suite(repeat):
+    """
+    Time the hot paths of suite_cases, the ones --save-baseline and --compare
+    track.
+    """
+    print("%-40s %14s" % ('case', 'us per call'))
+    for name, seconds in run_suite(repeat).items():
+        print("%-40s %14.2f" % (name, seconds * 1e6))
+
+
+def save_baseline(path, repeat):
+    """
+    Runs the suite and saves its times to <path> as JSON, with the Python
+    version and platform they were measured on
+    """
+    baseline = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'repeat': repeat,
+        'results': run_suite(repeat),
+    }
+    with open(path, 'w') as f:
+        json.dump(baseline, f, indent=2, sort_keys=True)
+        f.write('\n')
+    print("Saved %d cases to %s" % (len(baseline['results']), path))
+
+
+def compare_to_baseline(path, repeat, threshold):
+    """
+    Runs the suite and compares its times with the baseline saved at <path>.
+    A case regresses when it takes more than 1 + <threshold> times its
+    baseline time. Returns the number of cases that regressed.
+
+    Times are only comparable on the machine the baseline was saved on.
+    """
+    with open(path) as f:
+        baseline = json.load(f)
+    if baseline['platform'] != platform.platform() or baseline['python'] != platform.python_version():
+        print("Warning: the baseline was measured with Python %s on %s" % (baseline['python'],
+                                                                          baseline['platform']))
+    regressions = 0
+    print("%-40s %12s %12s %8s" % ('case', 'baseline us', 'current us', 'ratio'))
+    for name, seconds in run_suite(repeat).items():
+        base = baseline['results'].get(name)
+        if base is None:
+            print("%-40s %12s %12.2f %8s" % (name, '-', seconds * 1e6, 'new'))
+            continue
+        ratio = seconds / base
+        regressed = ratio > 1 + threshold
+        regressions += regressed
+        print("%-40s %12.2f %12.2f %7.2fx%s" % (name, base * 1e6, seconds * 1e6, ratio,
+                                                 '  REGRESSED' if regressed else ''))
+    print("%d case(s) regressed by more than %d%%" % (regressions, threshold * 100))
+    return regressions
+
+
+BENCHMARKS = {
+    'tracked': bench_tracked_games,
+    'masks': bench_placement_masks,
+    'suite': bench_suite,
+    'hda': bench_hash_distributed,
+    'parallel': bench_parallel_moves,
+    'memo': bench_memoized_heuristic,
+    'field': bench_distance_field,
+    'pdb': bench_pattern_db,
+    'eightpuzzle': bench_eight_puzzle,
+    'smastar': bench_sma_star,
+    'idastar': bench_idastar,
+    'ties': bench_tie_breaks,
+    'queues': bench_queues,
+    'nodes': bench_node_store,
+    'symmetry': bench_symmetry,
+    'hash': bench_visited_set,
+    'lazy': bench_lazy_successors,
+    'dfs': bench_in_place_dfs,
+    'backends': bench_board_backends,
+    'moves': bench_legal_moves,
+    'placements': bench_placement_index,
+}
+
+
+def main():
+    """
+    Processes the command used to run the benchmarks from the command line.
+    """
+    from optparse import OptionParser
+    usage_str = """
+    USAGE:      python benchmark.py <options>
+    EXAMPLES:  (1) python benchmark.py
+                  - runs every benchmark
+               (2) python benchmark.py -b moves -r 3
+               (3) python benchmark.py --save-baseline baseline.json
+                  - times the hot paths of the suite benchmark and saves them
+               (4) python benchmark.py --compare baseline.json --threshold 0.2
+                  - fails if a hot path got more than 20% slower than in baseline.json
+    """
+    parser = OptionParser(usage_str)
+    parser.add_option('-b', '--bench', dest='benches', action='append',
+                      type='choice', choices=sorted(BENCHMARKS),
+                      help='benchmark to run (may be repeated), one of: %s' % ', '.join(sorted(BENCHMARKS)))
+    parser.add_option('-r', '--repeat', dest='repeat', type='int', default=5,
+                      help='number of repeats per timing; the best one is reported')
+    parser.add_option('--save-baseline', dest='save_baseline', metavar='FILE', default=None,
+                      help='time the suite benchmark\'s hot paths and save them to FILE as JSON')
+    parser.add_option('--compare', dest='compare', metavar='FILE', default=None,
+                      help='time the suite benchmark\'s hot paths and compare them to the baseline in FILE; '
+                           'exits with 1 if any regressed')
+    parser.add_option('--threshold', dest='threshold', type='float', default=0.25,
+                      help='how much slower than its baseline (as a fraction) a hot path may get with --compare')
+
+    options, _ = parser.parse_args()
+    if options.save_baseline is not None:
+        save_baseline(options.save_baseline, options.repeat)
+        return 0
+    if options.compare is not None:
+        return 1 if compare_to_baseline(options.compare, options.repeat, options.threshold) else 0
+    for name in options.benches or sorted(BENCHMARKS):
+        print("== %s ==" % name)
+        BENCHMARKS[name](options.repeat)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,191 @@
+import numpy as np
+
+from board import Board, zobrist_keys
+import placements
+
+
+class BitBoard(Board):
+    """
+    A BitBoard is a Board that keeps its legality and corner information as
+    Python ints used as bit sets, with bit y * board_w + x standing for the
+    cell (x, y). Placements come from the PlacementIndex as int masks, so a
+    legality check is a couple of ANDs and add_move a handful of ORs.
+
+    It has the same public API as Board. On top of the Board fields it stores:
+    - _owned: a list of ints, the cells covered by each player's tiles
+    - _illegal: a list of ints, the cells each player can't play on (any
+      tile, or a cell adjacent to one of their own tiles)
+    - _corners: a list of ints, the cells diagonally attached to each
+      player's tiles or starting corner
+
+    The state array is kept up to date for the search problems and the
+    displays; connected and _legal are built from the bit sets on request and
+    are read-only.
+    """
+
+    def __init__(self, board_w, board_h, num_players, piece_list, starting_point=(0, 0)):
+        self.board_w = board_w
+        self.board_h = board_h
+        self.num_players = num_players
+        self.scores = [0] * self.num_players
+
+        self.state = np.full((board_h, board_w), -1, np.int8)
+
+        self._owned = [0] * num_players
+        self._illegal = [0] * num_players
+        self._corners = [0] * num_players
+        self.piece_list = piece_list
+        self.pieces = np.full((num_players, piece_list.get_num_pieces()), True, np.bool_)
+        self.placements = placements.PlacementIndex.for_board(board_w, board_h, piece_list)
+        self._journal = []
+        self._zobrist = zobrist_keys(num_players, board_w * board_h, piece_list.get_num_pieces())
+        self._hash = 0
+        self.add_starting_point(0, starting_point)
+
+    def _bit(self, x, y):
+        return 1 << (y * self.board_w + x)
+
+    def _to_array(self, bit_sets):
+        """
+        Unpack a list of bit sets into a num_players x board_h x board_w array
+        """
+        num_cells = self.board_w * self.board_h
+        num_bytes = (num_cells + 7) // 8
+        packed = np.frombuffer(b''.join(bits.to_bytes(num_bytes, 'little') for bits in bit_sets), np.uint8)
+        unpacked = np.unpackbits(packed.reshape(len(bit_sets), num_bytes), axis=1, count=num_cells,
+                                 bitorder='little')
+        array = unpacked.astype(np.bool_).reshape(len(bit_sets), self.board_h, self.board_w)
+        array.flags.writeable = False
+        return array
+
+    @property
+    def connected(self):
+        return self._to_array(self._corners)
+
+    @property
+    def _legal(self):
+        full = (1 << (self.board_w * self.board_h)) - 1
+        return self._to_array([full & ~illegal for illegal in self._illegal])
+
+    def add_starting_point(self, player, starting_point):
+        self._corners[player] |= self._bit(starting_point[1], starting_point[0])
+
+    def add_move(self, player, move):
+        """
+        Try to add <player>'s <move>.
+
+        If the move is legal, the board state is updated; if it's not legal, a
+        ValueError is raised.
+
+        Returns the number of tiles placed on the board.
+        """
+        if not self.check_move_valid(player, move):
+            raise ValueError("Move is not allowed")
+
+        tile_bits, neighbour_bits, diagonal_bits, _ = self.placements.bit_masks()
+        pid = self.placements.find(move)
+        tiles = tile_bits[pid]
+
+        self.pieces[player, move.piece_index] = False  # mark piece as used
+        cells = self.placements.tiles[pid, :move.piece.get_num_tiles()]
+        self.state.flat[cells] = player
+        cell_keys, piece_keys = self._zobrist
+        self._hash ^= piece_keys[player][move.piece_index]
+        for cell in cells.tolist():
+            self._hash ^= cell_keys[player][cell]
+
+        self._owned[player] |= tiles
+        # Nobody can play on these squares, and this player can't play next to them
+        for p in range(self.num_players):
+            self._illegal[p] |= tiles
+        self._illegal[player] |= neighbour_bits[pid]
+        # The diagonals are now attached
+        self._corners[player] |= diagonal_bits[pid]
+
+        self.scores[player] += move.piece.get_num_tiles()
+        return move.piece.get_num_tiles()
+
+    def apply(self, player, move):
+        """
+        Perform <player>'s <move> in place, so that undo() can take it back.
+        See Board.apply.
+        """
+        if not self.check_move_valid(player, move):
+            raise ValueError("Move is not allowed")
+
+        self._journal.append((player, move, self._hash, self._owned[:], self._illegal[:], self._corners[:]))
+        return self.add_move(player, move)
+
+    def undo(self):
+        """
+        Take back the last move performed with apply().
+        """
+        player, move, self._hash, self._owned, self._illegal, self._corners = self._journal.pop()
+        pid = self.placements.find(move)
+        self.state.flat[self.placements.tiles[pid, :move.piece.get_num_tiles()]] = -1
+        self.pieces[player, move.piece_index] = True
+        self.scores[player] -= move.piece.get_num_tiles()
+
+    def get_legal_moves(self, player):
+        """
+        Returns a list of legal moves for given player for this board state,
+        in the same order as get_legal_moves_scan.
+        """
+        tile_bits, _, _, covering = self.placements.bit_masks()
+        illegal = self._illegal[player]
+        anchors = self._corners[player] & ~illegal
+
+        candidates = set()
+        while anchors:
+            low_bit = anchors & -anchors
+            candidates.update(covering[low_bit.bit_length() - 1])
+            anchors ^= low_bit
+
+        available = self.pieces[player].tolist()
+        moves = self.placements.moves
+        return [moves[pid] for pid in sorted(candidates)
+                if not tile_bits[pid] & illegal and available[moves[pid].piece_index]]
+
+    def check_move_valid(self, player, move):
+        """
+        Check if <player> can legally perform <move>; see Board.check_move_valid.
+        """
+        if not self.pieces[player, move.piece_index]:
+            # piece has already been used
+            return False
+
+        pid = self.placements.find(move)
+        if pid is None:
+            # part of the piece is out of bounds
+            return False
+
+        tiles = self.placements.bit_masks()[0][pid]
+        return not tiles & self._illegal[player] and bool(tiles & self._corners[player])
+
+    def check_tile_legal(self, player, x, y):
+        if x < 0 or x >= self.board_w or y < 0 or y >= self.board_h:
+            return False
+        return not self._illegal[player] & self._bit(x, y)
+
+    def check_tile_attached(self, player, x, y):
+        if x < 0 or x >= self.board_w or y < 0 or y >= self.board_h:
+            return False
+        return bool(self._corners[player] & self._bit(x, y))
+
+    def __copy__(self):
+        cpy_board = BitBoard.__new__(BitBoard)
+        cpy_board.board_w = self.board_w
+        cpy_board.board_h = self.board_h
+        cpy_board.num_players = self.num_players
+        cpy_board.piece_list = self.piece_list
+        cpy_board.placements = self.placements
+        cpy_board.state = np.copy(self.state)
+        cpy_board._owned = self._owned[:]
+        cpy_board._illegal = self._illegal[:]
+        cpy_board._corners = self._corners[:]
+        cpy_board.pieces = np.copy(self.pieces)
+        cpy_board.scores = self.scores[:]
+        cpy_board._journal = []
+        cpy_board._zobrist = self._zobrist
+        cpy_board._hash = self._hash
+        return cpy_board
@@ -1,19 +1,118 @@
 import math
 from itertools import combinations
 
+import numpy as np
+
 from board import Board
+import parallel
 from search import SearchProblem, ucs
+import symmetry
 import util
 
 
-class BlokusFillProblem(SearchProblem):
+class BlokusSearchProblem(SearchProblem):
+    """
+    What the one-player Blokus search problems have in common: the player is
+    always #0, states are Boards, and they implement the lazy and in-place
+    successor protocols (see SearchProblem).
+    Subclasses set self.board, self.starting_point and self.expanded and
+    define get_step_cost.
+    """
+
+    # The board symmetries get_state_key reduces by; see enable_symmetry_reduction
+    symmetries = None
+    # The process pool legal_moves uses, if any; see enable_parallel_moves
+    move_generator = None
+
+    def goal_symmetries(self):
+        """
+        Returns the names (see symmetry.py) of the board symmetries that map
+        goal states to goal states.
+        """
+        return ['identity']
+
+    def enable_symmetry_reduction(self):
+        """
+        Make get_state_key give boards that are rotations or reflections of
+        each other the same key, so that searches only explore one of them.
+
+        Only the goal symmetries that also map the starting point to itself
+        are used: those map every reachable state to a reachable state with
+        the same cost to the goal. Returns the symmetries used.
+        """
+        symmetries = symmetry.fixing_symmetries(self.goal_symmetries(), self.board.board_w, self.board.board_h,
+                                                points=[self.starting_point])
+        self.symmetries = symmetries if len(symmetries) > 1 else None
+        return symmetries
+
+    def enable_parallel_moves(self, num_workers):
+        """
+        Make legal_moves split its work across <num_workers> worker processes
+        (see parallel.ParallelMoveGenerator); with fewer than two, go back to
+        generating moves in this process.
+        """
+        if self.move_generator is not None:
+            self.move_generator.close()
+            self.move_generator = None
+        if num_workers > 1:
+            self.move_generator = parallel.ParallelMoveGenerator(self.board, num_workers)
+
+    def legal_moves(self, state):
+        """
+        Returns the legal moves of player #0 on <state>, in get_legal_moves order
+        """
+        if self.move_generator is not None:
+            return self.move_generator.legal_moves(state, 0)
+        return state.get_legal_moves(0)
+
+    def get_step_cost(self, move):
+        """
+        Returns the cost of performing <move>
+        """
+        util.raiseNotDefined()
+
+    def get_actions(self, state):
+        """
+        state: Search state
+
+        Returns a list of (action, stepCost) pairs for the legal moves from <state>
+        """
+        self.expanded = self.expanded + 1
+        return [(move, self.get_step_cost(move)) for move in self.legal_moves(state)]
+
+    def get_successor(self, state, action):
+        return state.do_move(0, action)
+
+    def apply_action(self, state, action):
+        state.apply(0, action)
+
+    def undo_action(self, state):
+        state.undo()
+
+    def get_state_key(self, state):
+        """
+        Returns the key of <state>. Without symmetry reduction (or when only
+        the identity applies) it's state.key(), which reads the Zobrist hash
+        the board keeps up to date. With it, it's symmetry.canonical_key,
+        which copies the state array once per symmetry (up to 8 times on a
+        square board) on every call, so each lookup costs several times as
+        much, and it only pays off when it saves expansions (see the
+        'symmetry' benchmark).
+        """
+        if self.symmetries is not None:
+            return symmetry.canonical_key(state, self.symmetries)
+        return state.key()
+
+
+class BlokusFillProblem(BlokusSearchProblem):
     """
     A one-player Blokus game as a search problem.
     This problem is implemented for you. You should NOT change it!
     """
 
-    def __init__(self, board_w, board_h, piece_list, starting_point=(0, 0)):
-        self.board = Board(board_w, board_h, 1, piece_list, starting_point)
+    def __init__(self, board_w, board_h, piece_list, starting_point=(0, 0), board_class=Board):
+        self.board = board_class(board_w, board_h, 1, piece_list, starting_point)
+        self.starting_point = starting_point
         self.expanded = 0
 
     def get_start_state(self):
@@ -29,6 +128,9 @@ class BlokusFillProblem(SearchProblem):
         """
         return not any(state.pieces[0])
 
+    def goal_symmetries(self):
+        return symmetry.board_symmetries(self.board.board_w, self.board.board_h)
+
     def get_successors(self, state):
         """
         state: Search state
@@ -41,7 +143,10 @@ class BlokusFillProblem(SearchProblem):
         """
         # Note that for the search problem, there is only one player - #0
         self.expanded = self.expanded + 1
-        return [(state.do_move(0, move), move, 1) for move in state.get_legal_moves(0)]
+        return [(self.get_successor(state, move), move, 1) for move in self.legal_moves(state)]
+
+    def get_step_cost(self, move):
+        return 1
 
     def get_cost_of_actions(self, actions):
         """
@@ -56,15 +161,16 @@ class BlokusFillProblem(SearchProblem):
 #####################################################
 # This portion is incomplete.  Time to write code!  #
 #####################################################
-class BlokusCornersProblem(SearchProblem):
-    def __init__(self, board_w, board_h, piece_list, starting_point=(0, 0)):
-        self.board = Board(board_w, board_h, 1, piece_list, starting_point)
+class BlokusCornersProblem(BlokusSearchProblem):
+    def __init__(self, board_w, board_h, piece_list, starting_point=(0, 0), board_class=Board):
+        self.board = board_class(board_w, board_h, 1, piece_list, starting_point)
         self.starting_point = starting_point
         self.piece_list = piece_list
         self.board_h = board_h
         self.board_w = board_w
         self.expanded = 0
         self.corners = {(board_w - 1, board_h - 1), (board_w - 1, 0), (0, board_h - 1), (0, 0)}
+        self.min_piece_size = min(piece.get_num_tiles() for piece in piece_list)
 
     def get_start_state(self):
         """
@@ -79,6 +185,10 @@ class BlokusCornersProblem(SearchProblem):
                 return False
         return True
 
+    def goal_symmetries(self):
+        # Every symmetry of the board maps its corners onto each other
+        return symmetry.board_symmetries(self.board_w, self.board_h)
+
     def get_successors(self, state):
         """
         state: Search state
@@ -91,7 +201,10 @@ class BlokusCornersProblem(SearchProblem):
         """
         # Note that for the search problem, there is only one player - #0
         self.expanded = self.expanded + 1
-        return [(state.do_move(0, move), move, move.piece.get_num_tiles()) for move in state.get_legal_moves(0)]
+        return [(self.get_successor(state, move), move, move.piece.get_num_tiles()) for move in self.legal_moves(state)]
+
+    def get_step_cost(self, move):
+        return move.piece.get_num_tiles()
 
     def get_cost_of_actions(self, actions):
         """
@@ -130,10 +243,7 @@ def blokus_corners_heuristic(state, problem):
     corners = problem.corners
     board_matrix = state.state
     uncovered_corners = 0
-    pieces = problem.piece_list.pieces
-    min_piece_size = math.inf
-    for p in pieces:
-        min_piece_size = min(min_piece_size, p.num_tiles)
+    min_piece_size = problem.min_piece_size
     # because we know this is not a goal state, there should be at least one uncovered corner
     for corner_x, corner_y in corners:
         if board_matrix[corner_y][corner_x] == 0:  # this corner is already covered
@@ -143,17 +253,19 @@ def blokus_corners_heuristic(state, problem):
     return mult_factor * uncovered_corners
 
 
-class BlokusCoverProblem(SearchProblem):
-    def __init__(self, board_w, board_h, piece_list, starting_point=(0, 0), targets=[(0, 0)]):
-        self.board = Board(board_w, board_h, 1, piece_list, starting_point)
+class BlokusCoverProblem(BlokusSearchProblem):
+    def __init__(self, board_w, board_h, piece_list, starting_point=(0, 0), targets=[(0, 0)], board_class=Board):
+        self.board = board_class(board_w, board_h, 1, piece_list, starting_point)
+        self.starting_point = starting_point
         self.board_h = board_h
         self.board_w = board_w
         self.targets = targets.copy()
         self.piece_list = piece_list
         self.expanded = 0
+        self.min_piece_size = min(piece.get_num_tiles() for piece in piece_list)
         self.closest_targets = math.inf
         for (t1, t2) in list(combinations(targets, 2)):
-            dist = max(abs(t1[0] - t2[0]), abs(t1[1] - t2[0]))
+            dist = max(abs(t1[0] - t2[0]), abs(t1[1] - t2[1]))
             self.closest_targets = min(self.closest_targets, dist)
 
     def get_start_state(self):
@@ -169,6 +281,10 @@ class BlokusCoverProblem(SearchProblem):
                 return False
         return True
 
+    def goal_symmetries(self):
+        return symmetry.fixing_symmetries(symmetry.board_symmetries(self.board_w, self.board_h),
+                                          self.board_w, self.board_h, point_sets=[self.targets])
+
     def get_successors(self, state):
         """
         state: Search state
@@ -181,8 +297,11 @@ class BlokusCoverProblem(SearchProblem):
         """
         # Note that for the search problem, there is only one player - #0
         self.expanded = self.expanded + 1
-        return [(state.do_move(0, move), move, move.piece.get_num_tiles()) for
-                move in state.get_legal_moves(0)]
+        return [(self.get_successor(state, move), move, move.piece.get_num_tiles()) for
+                move in self.legal_moves(state)]
+
+    def get_step_cost(self, move):
+        return move.piece.get_num_tiles()
 
     def get_cost_of_actions(self, actions):
         """
@@ -205,35 +324,39 @@ def blokus_cover_heuristic(state, problem):
         This is a lower bound to the actual amount of tiles required to cover all targets,
         since if two targets can't be covered with one piece, they will take at least the minimum piece size for each
         target.
+        The farthest uncovered target in the board's distance field is another lower bound, so we return the larger
+        of the two; a target the field can't reach can never be covered.
         """
     targets = problem.targets
     board_matrix = state.state
-    uncovered_targets = 0
-    pieces = problem.piece_list.pieces
-    min_piece_size = math.inf
-    for p in pieces:
-        min_piece_size = min(min_piece_size, p.num_tiles)
-    # because we know this is not a goal state, there should be at least one uncovered corner
+    uncovered_targets = []
+    min_piece_size = problem.min_piece_size
     for t_x, t_y in targets:
         if board_matrix[t_x][t_y] == 0:  # this corner is already covered
             continue
-        uncovered_targets += 1
+        uncovered_targets.append((t_x, t_y))
+    if not uncovered_targets:
+        return 0
     mult_factor = min(min_piece_size, (problem.closest_targets + 1) / 2.0)
-    return uncovered_targets * mult_factor
+    field = state.distance_field(0, uncovered_targets)
+    distances = [field[t_x, t_y] for t_x, t_y in uncovered_targets]
+    if min(distances) < 0:
+        return math.inf
+    return max(len(uncovered_targets) * mult_factor, max(distances))
 
 
-class ClosestLocationSearch:
+class ClosestLocationSearch(BlokusSearchProblem):
     """
     In this problem you have to cover all given positions on the board,
     but the objective is speed, not optimality.
     """
 
-    def __init__(self, board_w, board_h, piece_list, starting_point=(0, 0), targets=(0, 0)):
+    def __init__(self, board_w, board_h, piece_list, starting_point=(0, 0), targets=(0, 0), board_class=Board):
         self.expanded = 0
         self.starting_point = starting_point
         self.targets = targets.copy()
         self.piece_list = piece_list
-        self.board = Board(board_w, board_h, 1, piece_list, starting_point)
+        self.board = board_class(board_w, board_h, 1, piece_list, starting_point)
         self.board_h = board_h
         self.board_w = board_w
 
@@ -262,7 +385,10 @@ class ClosestLocationSearch:
         """
         # Note that for the search problem, there is only one player - #0
         self.expanded = self.expanded + 1
-        return [(state.do_move(0, move), move, move.piece.get_num_tiles()) for move in state.get_legal_moves(0)]
+        return [(self.get_successor(state, move), move, move.piece.get_num_tiles()) for move in self.legal_moves(state)]
+
+    def get_step_cost(self, move):
+        return move.piece.get_num_tiles()
 
     def get_cost_of_actions(self, actions):
         """
@@ -290,14 +416,10 @@ class ClosestLocationSearch:
     def distance_to_target(self, target, state, is_start_state=False):
         if is_start_state:
             return abs(target[0] - self.starting_point[0]) + abs(self.starting_point[1] - target[1])
-        board = state.state
-        best_dist = math.inf
-        for x in range(self.board_w):
-            for y in range(self.board_h):
-                if board[x][y] == 0:
-                    dist = abs(target[0] - x) + abs(target[1] - y)
-                    best_dist = min(best_dist, dist)
-        return best_dist
+        tiles = np.argwhere(state.state == 0)
+        if len(tiles) == 0:
+            return math.inf
+        return int(np.abs(tiles - target).sum(axis=1).min())
 
     def solve(self):
         """
@@ -345,7 +467,7 @@ class MiniContestSearch:
     Implement your contest entry here
     """
 
-    def __init__(self, board_w, board_h, piece_list, starting_point=(0, 0), targets=(0, 0)):
+    def __init__(self, board_w, board_h, piece_list, starting_point=(0, 0), targets=(0, 0), board_class=Board):
         self.targets = targets.copy()
         "*** YOUR CODE HERE ***"
 
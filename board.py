@@ -1,5 +1,32 @@
+import random
+
 import numpy as np
 
+import placements
+
+_zobrist_tables = {}
+
+# Board.get_legal_moves switches from looking up the placements covering the
+# anchors to shifted-array masks once there are more placements to look up
+# than this many per orientation of the player's available pieces
+MASK_CANDIDATES_PER_ORIENTATION = 12
+
+
+def zobrist_keys(num_players, num_cells, num_pieces):
+    """
+    Returns (cell_keys, piece_keys), where cell_keys[player][cell] and
+    piece_keys[player][piece_index] are random 64-bit ints. They're drawn from
+    a fixed seed, so the hashes built from them agree between runs and
+    between processes.
+    """
+    table_key = (num_players, num_cells, num_pieces)
+    if table_key not in _zobrist_tables:
+        rng = random.Random('zobrist:%d:%d:%d' % table_key)
+        cell_keys = [[rng.getrandbits(64) for _ in range(num_cells)] for _ in range(num_players)]
+        piece_keys = [[rng.getrandbits(64) for _ in range(num_pieces)] for _ in range(num_players)]
+        _zobrist_tables[table_key] = (cell_keys, piece_keys)
+    return _zobrist_tables[table_key]
+
 
 class Board:
 
@@ -17,6 +44,13 @@ class Board:
       diagonally connected to another one of the player's tiles
     - piece_list: A PieceList object (probably shared with the game engine) to
       help understand the moves
+    - placements: the PlacementIndex of every in-bounds placement of
+      piece_list on this board size, shared by all boards of that shape
+    - _journal: what each move made with apply() changed, so undo() can
+      restore it
+    - _hash: the Zobrist hash of the board, the XOR of the keys (see
+      zobrist_keys) of every (player, cell) tile and every used (player,
+      piece), kept up to date by add_move
     """
 
     def __init__(self, board_w, board_h, num_players, piece_list, starting_point=(0, 0)):
@@ -33,6 +67,17 @@ class Board:
         self.connected[0, starting_point[0], starting_point[1]] = True
         self.piece_list = piece_list
         self.pieces = np.full((num_players, piece_list.get_num_pieces()), True, np.bool_)
+        self.placements = placements.PlacementIndex.for_board(board_w, board_h, piece_list)
+        self._journal = []
+        self._zobrist = zobrist_keys(num_players, board_w * board_h, piece_list.get_num_pieces())
+        self._hash = 0
+
+    def add_starting_point(self, player, starting_point):
+        """
+        Let <player> start from <starting_point>, a (row, col) pair like the
+        constructor's, by attaching that cell.
+        """
+        self.connected[player, starting_point[0], starting_point[1]] = True
 
     def add_move(self, player, move):
         """
@@ -48,11 +93,14 @@ class Board:
 
         piece = move.piece
         self.pieces[player, move.piece_index] = False  # mark piece as used
+        cell_keys, piece_keys = self._zobrist
+        self._hash ^= piece_keys[player][move.piece_index]
 
         # Update internal state for each tile
         for (xi, yi) in move.orientation:
             (x, y) = (xi + move.x, yi + move.y)
             self.state[y, x] = player
+            self._hash ^= cell_keys[player][y * self.board_w + x]
 
             # Nobody can play on this square
             for p in range(self.num_players):
@@ -81,6 +129,43 @@ class Board:
         self.scores[player] += piece.get_num_tiles()
         return piece.get_num_tiles()
 
+    def apply(self, player, move):
+        """
+        Perform <player>'s <move> in place, like add_move, but remember the
+        cells it changes so that undo() can take it back. Moves applied this
+        way form a stack, and must be undone in reverse order.
+
+        Returns the number of tiles placed on the board.
+        """
+        if not self.check_move_valid(player, move):
+            raise ValueError("Move is not allowed")
+
+        index = self.placements
+        pid = index.find(move)
+        tiles = index.tiles[pid, :move.piece.get_num_tiles()]
+        neighbours = index.cells(index.neighbour_mask[pid])
+        diagonals = index.cells(index.diagonal_mask[pid])
+        legal = self._legal.reshape(self.num_players, -1)
+        connected = self.connected.reshape(self.num_players, -1)
+        self._journal.append((player, move, self._hash, tiles, neighbours, diagonals, legal[:, tiles].copy(),
+                              legal[player, neighbours].copy(), connected[player, diagonals].copy()))
+        return self.add_move(player, move)
+
+    def undo(self):
+        """
+        Take back the last move performed with apply().
+        """
+        (player, move, self._hash, tiles, neighbours, diagonals,
+         legal_tiles, legal_neighbours, connected_diagonals) = self._journal.pop()
+        legal = self._legal.reshape(self.num_players, -1)
+        connected = self.connected.reshape(self.num_players, -1)
+        legal[:, tiles] = legal_tiles
+        legal[player, neighbours] = legal_neighbours
+        connected[player, diagonals] = connected_diagonals
+        self.state.flat[tiles] = -1
+        self.pieces[player, move.piece_index] = True
+        self.scores[player] -= move.piece.get_num_tiles()
+
     def do_move(self, player, move):
         """
         Performs a move, returning a new board
@@ -92,7 +177,115 @@ class Board:
 
     def get_legal_moves(self, player):
         """
-        Returns a list of legal moves for given player for this board state 
+        Returns a list of legal moves for given player for this board state
+
+        Every legal move puts at least one tile on an anchor: a cell that is
+        legal for <player> and diagonally attached to one of their tiles (or
+        their starting corner). Early on there are few anchors and the
+        placements covering them are looked up in the placement index; once
+        there are more of those than MASK_CANDIDATES_PER_ORIENTATION per
+        orientation of the player's available pieces, the legal placements of
+        every orientation are found at once with shifted arrays instead (see
+        legal_placement_mask).
+
+        The moves are the same, and in the same order, as get_legal_moves_scan.
+        """
+        # Placement ids sort in get_legal_moves_scan order
+        index = self.placements
+        return [index.moves[pid] for pid in self._legal_placement_ids(player).tolist()]
+
+    def _legal_placement_ids(self, player):
+        """
+        Helper function: the sorted ids of <player>'s legal placements, found
+        the way get_legal_moves describes
+        """
+        anchors = np.flatnonzero(self.connected[player] & self._legal[player])
+        if len(anchors) == 0:
+            return anchors
+
+        index = self.placements
+        available = self.pieces[player][index.mask_tables()[2]]
+        num_candidates = (index.covering_start[anchors + 1] - index.covering_start[anchors]).sum()
+        if num_candidates > MASK_CANDIDATES_PER_ORIENTATION * np.count_nonzero(available):
+            return self._legal_ids_by_masks(player, np.flatnonzero(available))
+        return self._legal_ids_at_anchors(player, anchors)
+
+    def _legal_ids_at_anchors(self, player, anchors):
+        """
+        Helper function: the sorted ids of the legal placements covering
+        <anchors>, checked for all of them at once
+        """
+        index = self.placements
+        candidates = np.unique(np.concatenate([index.covering[cell] for cell in anchors.tolist()]))
+        # The tiles array is padded with an out-of-board cell that is always legal
+        legal = np.append(self._legal[player].ravel(), True)
+        valid = legal[index.tiles[candidates]].all(axis=1) & self.pieces[player][index.piece_index[candidates]]
+        return candidates[valid]
+
+    def _legal_ids_by_masks(self, player, available):
+        """
+        Helper function: the sorted ids of the legal placements of the
+        <available> orientations (see PlacementIndex.mask_tables). The
+        player's legal and connected arrays are shifted once per distinct tile
+        offset, and each orientation ANDs the shifted legal arrays and ORs the
+        shifted connected arrays of its tiles.
+        """
+        index = self.placements
+        offsets, orientation_offsets, _, _, pid_grid = index.mask_tables()
+        h, w = self.board_h, self.board_w
+        legal = self._legal[player]
+        connected = self.connected[player]
+        shifted_legal = np.zeros((len(offsets), h, w), np.bool_)
+        shifted_connected = np.zeros((len(offsets), h, w), np.bool_)
+        for row, (xi, yi) in enumerate(offsets.tolist()):
+            if xi >= w or yi >= h:
+                continue  # no tile at this offset is ever in bounds
+            shifted_legal[row, :h - yi, :w - xi] = legal[yi:, xi:]
+            shifted_connected[row, :h - yi, :w - xi] = connected[yi:, xi:]
+
+        tiles = orientation_offsets[available]
+        masks = shifted_legal[tiles].all(axis=1) & shifted_connected[tiles].any(axis=1)
+        orientations, ys, xs = np.nonzero(masks)
+        return np.sort(pid_grid[available[orientations], ys, xs])
+
+    def legal_placement_mask(self, player, piece_index, orientation):
+        """
+        Returns a board_h x board_w bool array, True at [y, x] iff <player>
+        can place orientation <orientation> (an index into list(piece)) of
+        piece <piece_index> with its origin at (x, y).
+
+        Each tile offset (xi, yi) shifts the player's legal and connected
+        arrays by (-xi, -yi): a placement is legal where all of the shifted
+        legal arrays are True, and attached where any of the shifted
+        connected arrays is.
+        """
+        mask = np.zeros((self.board_h, self.board_w), np.bool_)
+        if not self.pieces[player, piece_index]:
+            return mask
+        offsets, orientation_offsets, _, orientation_start, _ = self.placements.mask_tables()
+        tiles = offsets[orientation_offsets[orientation_start[piece_index] + orientation]]
+        span_x, span_y = (tiles.max(axis=0) + 1).tolist()
+        h, w = self.board_h - span_y + 1, self.board_w - span_x + 1
+        if h <= 0 or w <= 0:
+            return mask
+
+        legal = self._legal[player]
+        connected = self.connected[player]
+        fits = np.ones((h, w), np.bool_)
+        attached = np.zeros((h, w), np.bool_)
+        for xi, yi in tiles.tolist():
+            fits &= legal[yi:yi + h, xi:xi + w]
+            attached |= connected[yi:yi + h, xi:xi + w]
+        mask[:h, :w] = fits & attached
+        return mask
+
+    def get_legal_moves_scan(self, player):
+        """
+        Returns a list of legal moves for given player for this board state by
+        trying every piece at every position in every orientation.
+
+        This is the reference implementation get_legal_moves is checked and
+        benchmarked against.
         """
         # Generate all legal moves
         move_list = []
@@ -124,18 +317,14 @@ class Board:
             # piece has already been used
             return False
 
-        attached_corner = False
-
-        for (x, y) in move.orientation:
-            # If any tile is illegal, this move isn't valid
-            if not self.check_tile_legal(player, x + move.x, y + move.y):
-                return False
-
-            if self.check_tile_attached(player, x + move.x, y + move.y):
-                attached_corner = True
+        pid = self.placements.find(move)
+        if pid is None:
+            # part of the piece is out of bounds
+            return False
 
-            # If at least one tile is attached, this move is valid
-        return attached_corner
+        tiles = self.placements.tiles[pid, :move.piece.get_num_tiles()]
+        # Every tile must be legal, and at least one tile must be attached
+        return bool(self._legal[player].flat[tiles].all() and self.connected[player].flat[tiles].any())
 
     def check_tile_legal(self, player, x, y):
         """
@@ -171,17 +360,85 @@ class Board:
         # Otherwise, it's in the lookup table
         return self.connected[player, y, x]
 
+    def distance_field(self, player, targets=None):
+        """
+        Returns a board_h x board_w array of the fewest tiles <player> still
+        needs to place to cover each cell: 0 for the cells they cover, -1 for
+        the cells they can never cover, and otherwise one more than the length
+        of the shortest path of king steps from a corner they can play on to
+        the cell, through cells they can play on. Every tile of a chain of
+        pieces reaching a cell is a king step from the one before it, so this
+        is a lower bound.
+
+        The field is grown out from the corners one step at a time, by
+        dilating the cells reached so far; if (row, col) <targets> are given,
+        it stops once they're all reached (or out of reach), leaving -1 in
+        the cells further away.
+        """
+        legal = self._legal[player]
+        reached = self.connected[player] & legal
+        field = np.full((self.board_h, self.board_w), -1, np.int32)
+        field[self.state == player] = 0
+        field[reached] = 1
+        if targets is not None:
+            rows, cols = np.array(targets, np.intp).reshape(-1, 2).T
+        frontier = reached
+        distance = 1
+        while frontier.any():
+            if targets is not None and (field[rows, cols] >= 0).all():
+                break
+            grown = frontier.copy()
+            grown[1:, :] |= frontier[:-1, :]
+            grown[:-1, :] |= frontier[1:, :]
+            dilated = grown.copy()
+            dilated[:, 1:] |= grown[:, :-1]
+            dilated[:, :-1] |= grown[:, 1:]
+            frontier = dilated & legal & ~reached
+            reached |= frontier
+            distance += 1
+            field[frontier] = distance
+        return field
+
     def get_position(self, x, y):
         return self.state[y, x]
 
     def score(self, player):
         return self.scores[player]
 
+    def key(self):
+        """
+        Returns an immutable snapshot of the board that is equal for equal
+        boards (see __eq__). Unlike the board itself, it can be kept in a
+        visited set while the board keeps changing through apply/undo.
+        The snapshot is a (Zobrist hash, bytes) tuple: the hash spreads keys
+        over hash tables and workers without reading the bytes, and the bytes
+        tell apart boards whose hashes collide.
+        """
+        return self._hash, self.state.tobytes() + self.pieces.tobytes()
+
     def __eq__(self, other):
-        return np.array_equal(self.state, other.state) and np.array_equal(self.pieces, other.pieces)
+        # Equal boards have equal hashes, so most unequal boards stop here
+        return (self._hash == other._hash and np.array_equal(self.state, other.state)
+                and np.array_equal(self.pieces, other.pieces))
 
     def __hash__(self):
-        return hash(str(self.state))
+        return self._hash
+
+    def __getstate__(self):
+        # The placement index and Zobrist keys are shared by every board of
+        # this shape and far bigger than the board itself: rebuild them from
+        # the per-process caches instead of pickling them.
+        state = self.__dict__.copy()
+        del state['placements'], state['_zobrist']
+        state['_journal'] = []
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.placements = placements.PlacementIndex.for_board(self.board_w, self.board_h, self.piece_list)
+        self.piece_list = self.placements.piece_list
+        self._zobrist = zobrist_keys(self.num_players, self.board_w * self.board_h,
+                                     self.piece_list.get_num_pieces())
 
     def __str__(self):
         out_str = []
@@ -195,12 +452,20 @@ class Board:
         return ''.join(out_str)
 
     def __copy__(self):
-        cpy_board = Board(self.board_w, self.board_h, self.num_players, self.piece_list)
+        cpy_board = self.__class__.__new__(self.__class__)
+        cpy_board.board_w = self.board_w
+        cpy_board.board_h = self.board_h
+        cpy_board.num_players = self.num_players
+        cpy_board.piece_list = self.piece_list
+        cpy_board.placements = self.placements
         cpy_board.state = np.copy(self.state)
         cpy_board._legal = np.copy(self._legal)
         cpy_board.connected = np.copy(self.connected)
         cpy_board.pieces = np.copy(self.pieces)
         cpy_board.scores = self.scores[:]
+        cpy_board._journal = []
+        cpy_board._zobrist = self._zobrist
+        cpy_board._hash = self._hash
         return cpy_board
 
 
@@ -0,0 +1,42 @@
+import hashlib
+import os
+
+"""
+Helpers for the disk caches under .cache/ of the tables that are slow to
+build (see placements.py and pattern_db.py). The caches are an optimisation
+only: a table that can't be saved is still returned to its caller, and is
+just built again next time.
+"""
+
+
+def layout_cache_path(cache_dir, file_name, piece_list, version, board_w, board_h):
+    """
+    Returns the cache file in <cache_dir> of a table built from <piece_list>
+    for a board_w x board_h board: <file_name> with '%s' replaced by a digest
+    of the piece list's layout file, the cache <version> and the board size.
+    Returns None if the piece list wasn't read from a layout file.
+    """
+    if piece_list.path is None:
+        return None
+    digest = hashlib.sha1()
+    with open(piece_list.path, 'rb') as f:
+        digest.update(f.read())
+    digest.update(('%d:%dx%d' % (version, board_w, board_h)).encode())
+    return os.path.join(cache_dir, file_name % digest.hexdigest())
+
+
+def save_atomically(path, write):
+    """
+    Calls <write>(tmp_path) to write a file next to <path> and then moves it
+    to <path>, so that other processes never load a half-written file.
+    Returns False, leaving <path> as it was, if the file can't be written.
+    """
+    root, extension = os.path.splitext(path)
+    tmp_path = '%s.%d.tmp%s' % (root, os.getpid(), extension)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    except OSError:
+        return False
+    return True
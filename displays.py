@@ -1,4 +1,3 @@
-import tkinter
 import sys
 
 """
@@ -17,9 +16,10 @@ class Display(object):
 
     display_error_string = "Error: using base display class"
 
-    def draw_board(self, board):
+    def draw_board(self, board, dots=()):
         """
-        Draw the board onto the screen, command line, etc
+        Draw the board onto the screen, command line, etc, marking the (row, col)
+        cells in <dots>
         """
         raise NotImplementedError(Display.display_error_string)
 
@@ -29,7 +29,7 @@ class NoDisplay(Display):
     iterations of the game.
     """
 
-    def draw_board(self, board):
+    def draw_board(self, board, dots=()):
         pass
 
 
@@ -69,6 +69,9 @@ class GuiDisplay(Display):
         self._bg_color = color
         self.kill = False
 
+        # Imported here so that headless runs don't need Tk
+        import tkinter
+
         # Create the root window
         self._root_window = tkinter.Tk()
         self._root_window.protocol('WM_DELETE_WINDOW', self._destroy_window)
@@ -8,6 +8,7 @@
 
 import search
 import random
+import time
 
 
 # Module Classes
@@ -193,7 +194,7 @@ class EightPuzzleSearchProblem(search.SearchProblem):
         self.puzzle = puzzle
 
     def get_start_state(self):
-        return puzzle
+        return self.puzzle
 
     def is_goal_state(self, state):
         return state.is_goal_state()
@@ -209,6 +210,16 @@ class EightPuzzleSearchProblem(search.SearchProblem):
             succ.append((state.result(a), a, 1))
         return succ
 
+    def get_goal_state(self):
+        return EightPuzzleState([0, 1, 2, 3, 4, 5, 6, 7, 8])
+
+    def get_predecessors(self, state):
+        """
+          Moves can be taken back, so the predecessors are the successors,
+          reached with the opposite moves
+        """
+        return [(pred, INVERSE_MOVES[move], cost) for pred, move, cost in self.get_successors(state)]
+
     def get_cost_of_actions(self, actions):
         """
          actions: A list of actions to take
@@ -263,6 +274,132 @@ def createRandomEightPuzzle(moves=100):
     return puzzle
 
 
+# Packed states
+#
+# A packed eight puzzle is an int holding the tile at each cell (row * 3 + col) in bits
+# 4 * cell to 4 * cell + 3, and the blank's cell in bits 36 to 39.
+
+BLANK_SHIFT = 36
+
+PACKED_GOAL = 0x876543210
+
+INVERSE_MOVES = {'up': 'down', 'down': 'up', 'left': 'right', 'right': 'left'}
+
+
+def _buildMoveTable():
+    """
+      Returns, for each cell the blank can be in, a list of
+      (move, tileShift, blankShift, blankDelta) for the legal moves, in
+      legalMoves order: the shifts of the tile the blank swaps with and of
+      the blank, and the change in the packed blank cell.
+    """
+    table = []
+    for blank in range(9):
+        row, col = divmod(blank, 3)
+        moves = []
+        for move, newRow, newCol in (('up', row - 1, col), ('down', row + 1, col),
+                                     ('left', row, col - 1), ('right', row, col + 1)):
+            if 0 <= newRow < 3 and 0 <= newCol < 3:
+                target = newRow * 3 + newCol
+                moves.append((move, 4 * target, 4 * blank, (target - blank) << BLANK_SHIFT))
+        table.append(moves)
+    return table
+
+
+MOVE_TABLE = _buildMoveTable()
+
+
+def packEightPuzzle(puzzle):
+    """
+      Returns the packed form of the EightPuzzleState 'puzzle'.
+
+      >>> packEightPuzzle(EightPuzzleState([0, 1, 2, 3, 4, 5, 6, 7, 8])) == PACKED_GOAL
+      True
+    """
+    packed = 0
+    for row in range(3):
+        for col in range(3):
+            packed |= puzzle.cells[row][col] << (4 * (row * 3 + col))
+    row, col = puzzle.blankLocation
+    return packed | (row * 3 + col) << BLANK_SHIFT
+
+
+def unpackEightPuzzle(packed):
+    """
+      Returns the EightPuzzleState of a packed eight puzzle.
+
+      >>> unpackEightPuzzle(PACKED_GOAL) == EightPuzzleState([0, 1, 2, 3, 4, 5, 6, 7, 8])
+      True
+    """
+    return EightPuzzleState([(packed >> (4 * cell)) & 15 for cell in range(9)])
+
+
+def packedResult(packed, move):
+    """
+      Returns the packed eight puzzle 'move' leads to from 'packed'. Illegal
+      moves raise an exception.
+    """
+    for tableMove, tileShift, blankShift, blankDelta in MOVE_TABLE[packed >> BLANK_SHIFT]:
+        if tableMove == move:
+            tile = (packed >> tileShift) & 15
+            return packed - (tile << tileShift) + (tile << blankShift) + blankDelta
+    raise Exception("Illegal Move")
+
+
+class PackedEightPuzzleSearchProblem(search.SearchProblem):
+    """
+      An EightPuzzleSearchProblem whose states are packed eight puzzles,
+      which are hashed and compared as single ints and need no copying.
+      Actions are the same as EightPuzzleSearchProblem's.
+    """
+
+    def __init__(self, puzzle):
+        "Creates a new PackedEightPuzzleSearchProblem from an EightPuzzleState."
+        self.puzzle = packEightPuzzle(puzzle)
+
+    def get_start_state(self):
+        return self.puzzle
+
+    def get_goal_state(self):
+        return PACKED_GOAL
+
+    def is_goal_state(self, state):
+        return state == PACKED_GOAL
+
+    def get_successors(self, state):
+        succ = []
+        for move, tileShift, blankShift, blankDelta in MOVE_TABLE[state >> BLANK_SHIFT]:
+            tile = (state >> tileShift) & 15
+            succ.append((state - (tile << tileShift) + (tile << blankShift) + blankDelta, move, 1))
+        return succ
+
+    def get_predecessors(self, state):
+        """
+          Moves can be taken back, so the predecessors are the successors,
+          reached with the opposite moves
+        """
+        return [(pred, INVERSE_MOVES[move], cost) for pred, move, cost in self.get_successors(state)]
+
+    def get_cost_of_actions(self, actions):
+        return len(actions)
+
+
+def batchSolve(count=100, moves=100, searchFunction=search.bidirectional_breadth_first_search,
+               problemClass=PackedEightPuzzleSearchProblem):
+    """
+      Solves 'count' puzzles made by createRandomEightPuzzle('moves') with
+      'searchFunction' on 'problemClass' problems, and prints how many were
+      solved per second. Returns the solution paths.
+    """
+    puzzles = [createRandomEightPuzzle(moves) for _ in range(count)]
+    start = time.perf_counter()
+    paths = [searchFunction(problemClass(puzzle)) for puzzle in puzzles]
+    elapsed = time.perf_counter() - start
+    print('Solved %d puzzles in %.3f seconds (%.1f solves/sec, %.1f moves on average)' %
+          (count, elapsed, count / elapsed, sum(len(path) for path in paths) / float(count)))
+    return paths
+
+
 if __name__ == '__main__':
     puzzle = createRandomEightPuzzle(25)
     print('A random puzzle:')
@@ -1,11 +1,19 @@
 from inputs import RandomInput
 from pieces import PieceList
 from blokus_problems import *
-from search import astar
+from bitboard import BitBoard
+from trackedboard import TrackedBoard
+from search import astar, hdastar, idastar, smastar, MemoizedHeuristic
+import portfolio
+import stats
 from displays import GuiDisplay
 import sys
 import os
 import ast
+import functools
+
+
+BOARD_CLASSES = {'numpy': Board, 'bitboard': BitBoard, 'tracked': TrackedBoard}
 
 
 class GameEngine(object):
@@ -14,8 +22,10 @@ class GameEngine(object):
     get input/draw output
     """
 
-    def __init__(self, inputs, width, height, piece_list):
-        self.display = GuiDisplay(width, height, title='Intro to AI -- 67842 -- Ex1')
+    def __init__(self, inputs, width, height, piece_list, board_class=Board, display=None):
+        if display is None:
+            display = GuiDisplay(width, height, title='Intro to AI -- 67842 -- Ex1')
+        self.display = display
         self.inputs = inputs
 
         self.piece_list = piece_list
@@ -26,15 +36,15 @@ class GameEngine(object):
         self.turn_num = 0
         self.passed = [False] * self.num_players
         self.score = [0] * self.num_players
-        self.board = Board(self.board_w, self.board_h, self.num_players, self.piece_list)
+        self.board = board_class(self.board_w, self.board_h, self.num_players, self.piece_list)
 
         # Set up initial corners for each player
         if self.num_players > 1:
-            self.board.connected[1, 0, self.board_w - 1] = True
+            self.board.add_starting_point(1, (0, self.board_w - 1))
             if self.num_players > 2:
-                self.board.connected[2, self.board_h - 1, 0] = True
+                self.board.add_starting_point(2, (self.board_h - 1, 0))
                 if self.num_players > 3:
-                    self.board.connected[3, self.board_h - 1, self.board_h - 1] = True
+                    self.board.add_starting_point(3, (self.board_h - 1, self.board_w - 1))
 
     def play_turn(self):
         """
@@ -90,10 +100,34 @@ class GameEngine(object):
         return self.score
 
 
-def play_simple_search(problem, search_func):
-    back_trace = search_func(problem)
-    display = GuiDisplay(problem.board.board_w, problem.board.board_h, title='Intro to AI -- 67842 -- Ex1')
+def make_problem(puzzle, size, piece_list, start=(0, 0), targets=None, board_class=Board):
+    """
+    Returns the problem of <puzzle> (one of the -z choices) on a board of <size>, a pair
+    of ints in the order of the -s option, with the player starting from <start> and,
+    for the puzzles that have them, the (row, col) <targets> to cover.
+    """
+    board_w, board_h = size[1], size[0]
+    if puzzle == 'fill':
+        return BlokusFillProblem(board_w, board_h, piece_list, start, board_class)
+    elif puzzle == 'corners':
+        return BlokusCornersProblem(board_w, board_h, piece_list, start, board_class)
+    elif puzzle == 'cover':
+        return BlokusCoverProblem(board_w, board_h, piece_list, start, targets, board_class)
+    elif puzzle == 'sub-optimal':
+        return ClosestLocationSearch(board_w, board_h, piece_list, start, targets, board_class)
+    elif puzzle == 'mini-contest':
+        return MiniContestSearch(board_w, board_h, piece_list, start, targets, board_class)
+    raise Exception('unrecognized puzzle %s' % puzzle)
+
+
+def draw_solution(problem, back_trace, display=None):
+    """
+    Plays <back_trace> from the start state of <problem> on <display> (a new GuiDisplay if
+    None) and returns the final board.
+    """
     board = problem.get_start_state()
+    if display is None:
+        display = GuiDisplay(board.board_w, board.board_h, title='Intro to AI -- 67842 -- Ex1')
     if problem.__class__ == BlokusCornersProblem:
         dots = [(board.board_h - 1, board.board_w - 1), (0, board.board_w - 1), (board.board_h - 1, 0)]
     else:
@@ -104,36 +138,37 @@ def play_simple_search(problem, search_func):
     for action in back_trace:
         board.add_move(0, action)
         display.draw_board(board, dots=dots)
-    print("Expanded nodes: %d, score: %d" % (problem.expanded, board.score(0)))
-    print(problem.get_cost_of_actions(back_trace))
+    return board
 
 
-def play_a_star_search(problem, heuristic):
-    back_trace = astar(problem, heuristic)
-    display = GuiDisplay(problem.board.board_w, problem.board.board_h, title='Intro to AI -- 67842 -- Ex1')
-    board = problem.get_start_state()
+def play_simple_search(problem, search_func, display=None):
+    with stats.for_problem(problem).timed('search'):
+        back_trace = search_func(problem)
+    if back_trace is None:
+        print("Expanded nodes: %d, no solution found" % problem.expanded)
+        return
+    board = draw_solution(problem, back_trace, display)
+    print("Expanded nodes: %d, score: %d" % (problem.expanded, board.score(0)))
+    print(problem.get_cost_of_actions(back_trace))
 
-    if problem.__class__ == BlokusCornersProblem:
-        dots = [(board.board_h - 1, board.board_w - 1), (0, board.board_w - 1), (board.board_h - 1, 0)]
-    else:
-        try:
-            dots = problem.targets
-        except AttributeError:
-            dots = []
 
-    for action in back_trace:
-        board.add_move(0, action)
-        display.draw_board(board, dots=dots)
-    print("Expanded nodes: %d, score: %d" % (problem.expanded, board.score(0)))
+def play_a_star_search(problem, heuristic, search_func=astar, cache_size=1 << 16, display=None):
+    heuristic = MemoizedHeuristic(heuristic, cache_size)
+    with stats.for_problem(problem).timed('search'):
+        back_trace = search_func(problem, heuristic)
+    cache_stats = "heuristic cache hits: %d, misses: %d" % (heuristic.hits, heuristic.misses)
+    if hasattr(problem, 'forgotten'):
+        print("Forgotten nodes: %d, regenerated nodes: %d" % (problem.forgotten, problem.regenerated))
+    if back_trace is None:
+        print("Expanded nodes: %d, no solution found, %s" % (problem.expanded, cache_stats))
+        return
+    board = draw_solution(problem, back_trace, display)
+    print("Expanded nodes: %d, score: %d, %s" % (problem.expanded, board.score(0), cache_stats))
 
 
-def play_approximate_search(problem):
+def play_approximate_search(problem, display=None):
     back_trace = problem.solve()
-    display = GuiDisplay(problem.board.board_w, problem.board.board_h, title='Intro to AI -- 67842 -- Ex1')
-    board = problem.get_start_state()
-    for action in back_trace:
-        board.add_move(0, action)
-        display.draw_board(board, dots=problem.targets)
+    board = draw_solution(problem, back_trace, display)
     print("Expanded nodes: %d, score: %d" % (problem.expanded, board.score(0)))
 
 
@@ -182,9 +217,10 @@ def main():
     parser.add_option('-f', '--search-function', dest='search_func',
                       metavar='FUNC', help='search function to use. This option is ignored for sub-optimal search. ',
                       type='choice',
-                      choices=['dfs', 'bfs', 'ucs', 'astar'], default='dfs')
+                      choices=['dfs', 'dfs_in_place', 'bfs', 'ucs', 'astar', 'idastar', 'smastar', 'hdastar',
+                               'portfolio'], default='dfs')
     parser.add_option('-H', '--heuristic', dest='h_func',
-                      help='heuristic function to use for A* search. \
+                      help='heuristic function to use for A*, IDA*, SMA* and HDA* search. \
                       This option is ignored for other search functions. ',
                       metavar='FUNC', default=None)
     parser.add_option('-z', '--puzzle', dest='puzzle',
@@ -192,8 +228,33 @@ def main():
                       choices=['fill', 'diagonal', 'corners', 'cover', 'sub-optimal', 'mini-contest'], default=None)
     parser.add_option('-x', '--start-point', dest='start', type='int', nargs=2,
                       help='starting point', default=(0, 0))
+    parser.add_option('-b', '--board', dest='board', type='choice',
+                      choices=sorted(BOARD_CLASSES), default='numpy',
+                      help='board representation: numpy arrays or Python int bitboards')
+    parser.add_option('--symmetry', dest='symmetry', action='store_true', default=False,
+                      help='let the search treat rotations and reflections of a state as the same state')
+    parser.add_option('--max-nodes', dest='max_nodes', type='int', default=None,
+                      help='the most nodes SMA* search keeps in memory (default 100000)')
+    parser.add_option('--max-mb', dest='max_mb', type='float', default=None,
+                      help='the memory SMA* search may use for its nodes, in megabytes, if --max-nodes is not given')
+    parser.add_option('--workers', dest='workers', type='int', default=1,
+                      help='number of worker processes to generate legal moves with, or to run HDA* search in')
+    parser.add_option('--portfolio', dest='portfolio', default=None,
+                      help='comma-separated strategies for -f portfolio, each search_func or search_func:heuristic '
+                           '(default: the puzzle\'s portfolio in portfolio.DEFAULT_PORTFOLIOS)')
+    parser.add_option('--optimal-only', dest='optimal_only', action='store_true', default=False,
+                      help='only race the strategies of the portfolio that return optimal solutions')
+    parser.add_option('--portfolio-stats', dest='portfolio_stats', default=portfolio.DEFAULT_STATS_FILE,
+                      help='the JSONL file each portfolio run is recorded in')
+    parser.add_option('--stats', dest='stats_file', default=None,
+                      help='count and time what the search does, print a summary and save it to this JSON file '
+                           '(not for -f hdastar or portfolio, which search in other processes)')
+    parser.add_option('--heuristic-cache', dest='cache_size', type='int', default=1 << 16,
+                      help='how many heuristic values A*, IDA*, SMA* and HDA* search remember (0 to remember none)')
 
     options, cover_points = parser.parse_args()
+    if options.stats_file is not None and options.search_func in ('hdastar', 'portfolio'):
+        parser.error('--stats is not supported with -f %s, which searches in other processes' % options.search_func)
     if (options.puzzle == 'cover' or options.puzzle == 'sub-optimal') and len(cover_points) == 0:
         raise Exception('cover puzzles require at least one point to cover!')
 
@@ -201,33 +262,71 @@ def main():
         targets = ast.literal_eval(''.join(cover_points))
 
     piece_list = PieceList(options.pieces_file)
+    board_class = BOARD_CLASSES[options.board]
 
     if options.puzzle is None:
         inputs = [RandomInput() for _ in range(4)]
-        engine = GameEngine(inputs, options.size[1], options.size[0], piece_list)
+        engine = GameEngine(inputs, options.size[1], options.size[0], piece_list, board_class)
         engine.play_game()
 
     elif options.puzzle == 'sub-optimal':
-        problem = ClosestLocationSearch(options.size[1], options.size[0], piece_list, options.start, targets)
-        play_approximate_search(problem)
+        problem = make_problem(options.puzzle, options.size, piece_list, options.start, targets, board_class)
+        problem.enable_parallel_moves(options.workers)
+        try:
+            play_approximate_search(problem)
+        finally:
+            problem.enable_parallel_moves(0)  # stop the move generator's worker processes
 
     elif options.puzzle == 'mini-contest':
-        problem = MiniContestSearch(options.size[1], options.size[0], piece_list, options.start, targets)
+        problem = make_problem(options.puzzle, options.size, piece_list, options.start, targets, board_class)
         play_approximate_search(problem)
 
-    elif options.search_func in ['dfs', 'bfs', 'ucs', 'astar']:
-        if options.puzzle == 'fill':
-            problem = BlokusFillProblem(options.size[1], options.size[0], piece_list, options.start)
-        elif options.puzzle == 'corners':
-            problem = BlokusCornersProblem(options.size[1], options.size[0], piece_list, options.start)
-        elif options.puzzle == 'cover':
-            problem = BlokusCoverProblem(options.size[1], options.size[0], piece_list, options.start, targets)
-
-        if options.search_func in ['dfs', 'bfs', 'ucs']:
-            search = __import__('search')
-            play_simple_search(problem, getattr(search, options.search_func))
-        elif options.search_func == 'astar':
-            play_a_star_search(problem, load_heuristic(options.h_func))
+    elif options.search_func in ['dfs', 'dfs_in_place', 'bfs', 'ucs', 'astar', 'idastar', 'smastar', 'hdastar',
+                                 'portfolio']:
+        problem = make_problem(options.puzzle, options.size, piece_list, options.start,
+                               targets if options.puzzle == 'cover' else None, board_class)
+        if options.symmetry:
+            problem.enable_symmetry_reduction()
+        if options.search_func not in ('hdastar', 'portfolio'):
+            problem.enable_parallel_moves(options.workers)
+        try:
+            if options.stats_file is not None:
+                stats.enable(problem)
+
+            if options.search_func in ['dfs', 'dfs_in_place', 'bfs', 'ucs']:
+                search = __import__('search')
+                play_simple_search(problem, getattr(search, options.search_func))
+            elif options.search_func == 'astar':
+                play_a_star_search(problem, load_heuristic(options.h_func), cache_size=options.cache_size)
+            elif options.search_func == 'idastar':
+                play_a_star_search(problem, load_heuristic(options.h_func), idastar, options.cache_size)
+            elif options.search_func == 'smastar':
+                play_a_star_search(problem, load_heuristic(options.h_func),
+                                   functools.partial(smastar, max_nodes=options.max_nodes, max_mb=options.max_mb),
+                                   options.cache_size)
+            elif options.search_func == 'hdastar':
+                play_a_star_search(problem, load_heuristic(options.h_func),
+                                   functools.partial(hdastar, num_workers=options.workers), options.cache_size)
+            elif options.search_func == 'portfolio':
+                if options.portfolio is None:
+                    specs = portfolio.DEFAULT_PORTFOLIOS[options.puzzle]
+                else:
+                    specs = options.portfolio.split(',')
+                strategies = portfolio.parse_strategies(specs, load_heuristic)
+                play_simple_search(problem, functools.partial(portfolio.portfolio_search, strategies=strategies,
+                                                              optimal_only=options.optimal_only,
+                                                              stats_file=options.portfolio_stats,
+                                                              puzzle=options.puzzle))
+                if problem.winner is None:
+                    print("No strategy found a solution")
+                else:
+                    print("Winning strategy: %s" % problem.winner)
+            if options.stats_file is not None:
+                print(problem.stats.summary())
+                problem.stats.save(options.stats_file, puzzle=options.puzzle, search=options.search_func,
+                                   heuristic=options.h_func, size=options.size)
+        finally:
+            problem.enable_parallel_moves(0)  # stop the move generator's worker processes
     else:
         raise Exception('unrecognized options')
 
@@ -1,3 +1,6 @@
+import random
+
+
 class Input(object):
     """
     The Input class defines an interface for the game engine to get input
@@ -28,14 +31,16 @@ class Input(object):
 
 class RandomInput(Input):
     """RandomInput players choose random moves (equally distributed over piece
-    number, x/y, and rotation/flip)
+    number, x/y, and rotation/flip), drawn from <rng>, a random.Random, or
+    from the random module's generator if it's None
     """
 
-    def get_move(self, player, board):
-        import random
+    def __init__(self, rng=None):
+        self.rng = random if rng is None else rng
 
+    def get_move(self, player, board):
         move_list = board.get_legal_moves(player)
         if move_list:
-            return move_list[random.randint(0, len(move_list) - 1)]
+            return move_list[self.rng.randint(0, len(move_list) - 1)]
         # else
         return None
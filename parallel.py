@@ -0,0 +1,119 @@
+from multiprocessing import shared_memory
+import weakref
+
+import numpy as np
+
+import placements
+import processes
+
+"""
+Legal move generation split across a pool of worker processes.
+
+The parent writes the parts of a board a player's legal moves depend on
+into one block of shared memory; each worker checks the placements of its
+own range of pieces against numpy views of that block and sends back the
+ids of the legal ones, so neither boards nor moves are pickled per task.
+"""
+
+# The worker's views of the shared block and its PlacementIndex, set by _init_worker
+_worker = {}
+
+
+def _layout(num_cells, num_pieces):
+    """
+    Returns the (offset, length) of the legal, connected and available
+    arrays in the shared block.
+    The arrays have one more cell than the board, for the padding in the
+    placements' tiles: it's always legal and never connected, so that only a
+    piece's own tiles decide the all() and any() checks.
+    """
+    return (0, num_cells + 1), (num_cells + 1, num_cells + 1), (2 * num_cells + 2, num_pieces)
+
+
+def _views(buffer, num_cells, num_pieces):
+    return [np.ndarray((length,), np.bool_, buffer, offset) for offset, length in _layout(num_cells, num_pieces)]
+
+
+def _init_worker(shm_name, board_w, board_h, piece_list):
+    shm = shared_memory.SharedMemory(name=shm_name)
+    num_cells = board_w * board_h
+    _worker['shm'] = shm
+    _worker['views'] = _views(shm.buf, num_cells, piece_list.get_num_pieces())
+    _worker['index'] = placements.PlacementIndex.for_board(board_w, board_h, piece_list)
+
+
+def _legal_placements(id_range):
+    """
+    Returns the ids of the legal placements among placements id_range[0] to
+    id_range[1] - 1, in order
+    """
+    start, end = id_range
+    legal, connected, available = _worker['views']
+    index = _worker['index']
+    tiles = index.tiles[start:end]
+    ok = legal[tiles].all(axis=1) & connected[tiles].any(axis=1) & available[index.piece_index[start:end]]
+    return (np.flatnonzero(ok) + start).tolist()
+
+
+class ParallelMoveGenerator(object):
+    """
+    A pool of <num_workers> processes that find the legal moves of boards of
+    the same size and piece list as <board>. The placements are split into
+    one contiguous range of pieces per worker, with about the same number of
+    placements in each, and the results are put back together in range
+    order, which is the order Board.get_legal_moves returns.
+
+    Call close() when done with it.
+    """
+
+    def __init__(self, board, num_workers):
+        self.index = placements.PlacementIndex.for_board(board.board_w, board.board_h, board.piece_list)
+        self.num_cells = board.board_w * board.board_h
+        num_pieces = board.piece_list.get_num_pieces()
+        size = sum(length for _, length in _layout(self.num_cells, num_pieces))
+        self.shm = shared_memory.SharedMemory(create=True, size=size)
+        self._finalizer = weakref.finalize(self, ParallelMoveGenerator._release, self.shm)
+        self.legal, self.connected, self.available = _views(self.shm.buf, self.num_cells, num_pieces)
+        self.legal[self.num_cells] = True
+        self.connected[self.num_cells] = False
+
+        # Placements are numbered piece by piece: cut between pieces near each even share
+        num_placements = len(self.index.moves)
+        piece_starts = np.searchsorted(self.index.piece_index, np.arange(num_pieces + 1))
+        cuts = [0]
+        for worker in range(1, num_workers):
+            share = num_placements * worker // num_workers
+            cut = int(piece_starts[np.abs(piece_starts - share).argmin()])
+            if cut > cuts[-1]:
+                cuts.append(cut)
+        cuts.append(num_placements)
+        self.ranges = list(zip(cuts[:-1], cuts[1:]))
+
+        context = processes.get_context()
+        self.pool = context.Pool(num_workers, _init_worker,
+                                 (self.shm.name, board.board_w, board.board_h, board.piece_list))
+
+    @staticmethod
+    def _release(shm):
+        shm.close()
+        shm.unlink()
+
+    def legal_moves(self, board, player):
+        """
+        Returns the list of legal moves of <player> on <board>, the same as
+        board.get_legal_moves(player).
+        """
+        self.legal[:self.num_cells] = board._legal[player].ravel()
+        self.connected[:self.num_cells] = board.connected[player].ravel()
+        self.available[:] = board.pieces[player]
+        moves = self.index.moves
+        return [moves[pid] for ids in self.pool.map(_legal_placements, self.ranges) for pid in ids]
+
+    def close(self):
+        """
+        Stops the workers and frees the shared memory.
+        """
+        self.pool.terminate()
+        self.pool.join()
+        del self.legal, self.connected, self.available
+        self._finalizer()
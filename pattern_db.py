@@ -0,0 +1,264 @@
+import collections
+import math
+import os
+
+import numpy as np
+
+import disk_cache
+
+"""
+Pattern databases: tables of exact costs in a relaxed version of a problem,
+built once, saved as .npy files and memory-mapped when they're used as
+heuristics. Every table here is a lower bound on the real cost, so the
+heuristics are admissible (and consistent).
+
+Eight puzzle: an additive pattern database over disjoint tile subsets. The
+table of a subset holds, for every placement of its tiles, the fewest moves
+of those tiles that bring them home when the other tiles aren't there; the
+tables of disjoint subsets can be added up.
+
+Blokus cover: for one piece list and board size, a table of the fewest tiles
+it takes to cover a cell at each (row, col) offset from a cell a piece can
+be attached to, on an empty board where every piece can be used again and
+two pieces only have to touch. The heuristic is the most that any uncovered
+target needs from the nearest such cell.
+"""
+
+CACHE_DIR = os.path.join('.cache', 'pattern_db')
+CACHE_VERSION = 1
+
+EIGHT_PUZZLE_PATTERNS = ((1, 2, 3, 4), (5, 6, 7, 8))
+
+# A table entry for a cell that can't be reached
+UNREACHABLE = 255
+
+_NEIGHBOURS = [(dr, dc) for dr in (-1, 0, 1) for dc in (-1, 0, 1) if dr or dc]
+
+_tables = {}
+
+
+def _load_or_build(path, build):
+    """
+    Returns the table saved at <path>, memory-mapped, building and saving it
+    with <build>() first if it isn't there. With no path, the table is built
+    and kept in memory only.
+    """
+    if path is None:
+        return build()
+    if not os.path.isfile(path):
+        table = build()
+        if not disk_cache.save_atomically(path, lambda tmp_path: np.save(tmp_path, table)):
+            return table
+    return np.load(path, mmap_mode='r')
+
+
+def build_eight_puzzle_table(pattern):
+    """
+    Returns the pattern database of the eight puzzle tiles in <pattern>: a
+    9 x ... x 9 uint8 array, one axis per tile, holding the fewest moves of
+    those tiles needed to bring them from the given cells to their goal
+    cells (tile t's goal cell is t).
+
+    The other tiles are ignored, so a tile can move to any neighbouring cell
+    none of the others in <pattern> is in. Every real move moves one tile,
+    which makes the tables of disjoint patterns add up to a consistent
+    heuristic.
+    """
+    num_tiles = len(pattern)
+    radix = [9 ** (num_tiles - 1 - i) for i in range(num_tiles)]
+    distances = np.full(9 ** num_tiles, UNREACHABLE, np.uint8)
+    goal = tuple(pattern)
+    distances[sum(cell * radix[i] for i, cell in enumerate(goal))] = 0
+    fringe = collections.deque([goal])
+    while fringe:
+        cells = fringe.popleft()
+        distance = distances[sum(cell * radix[i] for i, cell in enumerate(cells))] + 1
+        for i, cell in enumerate(cells):
+            row, col = divmod(cell, 3)
+            for dr, dc in ((-1, 0), (1, 0), (0, -1), (0, 1)):
+                target = cell + 3 * dr + dc
+                if not (0 <= row + dr < 3 and 0 <= col + dc < 3) or target in cells:
+                    continue
+                index = sum(c * radix[j] for j, c in enumerate(cells)) + (target - cell) * radix[i]
+                if distances[index] == UNREACHABLE:
+                    distances[index] = distance
+                    fringe.append(cells[:i] + (target,) + cells[i + 1:])
+    return distances.reshape((9,) * num_tiles)
+
+
+def eight_puzzle_table(pattern):
+    """
+    Returns the pattern database of the tiles in <pattern> (see
+    build_eight_puzzle_table), memory-mapped from the cache.
+    """
+    key = ('eightpuzzle', tuple(pattern))
+    table = _tables.get(key)
+    if table is None:
+        path = os.path.join(CACHE_DIR, 'eightpuzzle-%d-%s.npy' % (CACHE_VERSION, '-'.join(map(str, pattern))))
+        table = _load_or_build(path, lambda: build_eight_puzzle_table(pattern))
+        _tables[key] = table
+    return table
+
+
+def _eight_puzzle_cells(state):
+    """
+    Returns a list of the cell each tile of an EightPuzzleState or of a
+    packed eight puzzle (see eightpuzzle.packEightPuzzle) is in
+    """
+    cells = [0] * 9
+    if isinstance(state, int):
+        for cell in range(9):
+            cells[(state >> (4 * cell)) & 15] = cell
+    else:
+        for row in range(3):
+            for col in range(3):
+                cells[state.cells[row][col]] = row * 3 + col
+    return cells
+
+
+def eight_puzzle_pdb_heuristic(state, problem=None):
+    """
+    The sum of the EIGHT_PUZZLE_PATTERNS pattern databases, for
+    EightPuzzleSearchProblem and PackedEightPuzzleSearchProblem states.
+    """
+    cells = _eight_puzzle_cells(state)
+    return sum(int(eight_puzzle_table(pattern)[tuple(cells[tile] for tile in pattern)])
+               for pattern in EIGHT_PUZZLE_PATTERNS)
+
+
+def _piece_reach(piece_list):
+    """
+    Returns a dict mapping each (row, col) offset between two tiles of the
+    same placed piece to the fewest tiles of a piece with two tiles that far
+    apart.
+    """
+    reach = {}
+    for piece in piece_list:
+        num_tiles = piece.get_num_tiles()
+        for orientation in piece:
+            for x1, y1 in orientation:
+                for x2, y2 in orientation:
+                    offset = (y2 - y1, x2 - x1)
+                    if num_tiles < reach.get(offset, UNREACHABLE):
+                        reach[offset] = num_tiles
+    return reach
+
+
+def _shifted(array, dr, dc):
+    """
+    Returns <array> moved by (dr, dc), with infinity in the cells left empty
+    """
+    h, w = array.shape
+    result = np.full_like(array, np.inf)
+    if abs(dr) < h and abs(dc) < w:
+        result[max(dr, 0):h + min(dr, 0), max(dc, 0):w + min(dc, 0)] = \
+            array[max(-dr, 0):h - max(dr, 0), max(-dc, 0):w - max(dc, 0)]
+    return result
+
+
+def build_cover_table(board_w, board_h, piece_list):
+    """
+    Returns the cover table of <piece_list> on a board_w x board_h board: a
+    (2 * board_h - 1) x (2 * board_w - 1) uint8 array whose entry at
+    (board_h - 1 + dr, board_w - 1 + dc) is the fewest tiles needed to cover
+    the cell (dr, dc) away from a cell the player can play on, relaxing the
+    rules as described at the top of this module. The array covers every
+    offset between two cells of the board.
+
+    attach[cell] is the fewest tiles of pieces placed before a piece can
+    cover <cell>: 0 for the starting cell, and otherwise the cost of any
+    tile next to it. It's found by relaxing every (piece reach, neighbour)
+    step until nothing changes, a numpy Bellman-Ford.
+    """
+    reach = _piece_reach(piece_list)
+    steps = {}
+    for (dr, dc), num_tiles in reach.items():
+        for nr, nc in _NEIGHBOURS:
+            step = (dr + nr, dc + nc)
+            steps[step] = min(steps.get(step, UNREACHABLE), num_tiles)
+
+    attach = np.full((2 * board_h - 1, 2 * board_w - 1), np.inf)
+    attach[board_h - 1, board_w - 1] = 0
+    while True:
+        relaxed = attach
+        for (dr, dc), num_tiles in steps.items():
+            relaxed = np.minimum(relaxed, _shifted(attach, dr, dc) + num_tiles)
+        if np.array_equal(relaxed, attach):
+            break
+        attach = relaxed
+
+    cover = np.full_like(attach, np.inf)
+    for (dr, dc), num_tiles in reach.items():
+        cover = np.minimum(cover, _shifted(attach, dr, dc) + num_tiles)
+    return np.where(np.isfinite(cover), np.minimum(cover, UNREACHABLE - 1), UNREACHABLE).astype(np.uint8)
+
+
+def cover_table(board_w, board_h, piece_list):
+    """
+    Returns the cover table of <piece_list> on a board_w x board_h board (see
+    build_cover_table), memory-mapped from the cache if the piece list was
+    read from a layout file.
+    """
+    key = ('cover', board_w, board_h, tuple(piece_list.pieces))
+    table = _tables.get(key)
+    if table is None:
+        path = disk_cache.layout_cache_path(CACHE_DIR, 'cover-%s.npy', piece_list, CACHE_VERSION, board_w, board_h)
+        table = _load_or_build(path, lambda: build_cover_table(board_w, board_h, piece_list))
+        _tables[key] = table
+    return table
+
+
+def blokus_cover_pdb_heuristic(state, problem):
+    """
+    The most tiles any uncovered target of a BlokusCoverProblem needs, from
+    the cover table: for each target, the least over the cells the player can
+    play on of the entry at their offset. Like blokus_cover_heuristic, it's
+    math.inf when a target can't be covered any more.
+    """
+    uncovered = [target for target in problem.targets if state.state[target[0], target[1]] == -1]
+    if not uncovered:
+        return 0
+    anchors = np.argwhere(state.connected[0] & state._legal[0])
+    if len(anchors) == 0:
+        return math.inf
+    table = cover_table(problem.board_w, problem.board_h, problem.piece_list)
+    targets = np.array(uncovered)
+    costs = table[targets[:, 0, None] - anchors[:, 0] + problem.board_h - 1,
+                  targets[:, 1, None] - anchors[:, 1] + problem.board_w - 1]
+    cost = int(costs.min(axis=1).max())
+    return math.inf if cost == UNREACHABLE else cost
+
+
+def main():
+    """
+    Builds the pattern databases ahead of time.
+    """
+    from optparse import OptionParser
+    from pieces import PieceList
+    usage_str = """
+    USAGE:      python pattern_db.py <options>
+    EXAMPLES:   (1) python pattern_db.py
+                    - builds the eight puzzle pattern databases
+                (2) python pattern_db.py -p small_set.txt -s 8 8
+                    - also builds the cover table of small_set.txt on 8x8 boards
+    """
+    parser = OptionParser(usage_str)
+    parser.add_option('-p', '--pieces', dest='pieces_file', default=None,
+                      help='the piece list to build a cover table for')
+    parser.add_option('-s', '--board-size', dest='size', type='int', nargs=2, default=(20, 20),
+                      help='the size of the board of the cover table')
+
+    options, _ = parser.parse_args()
+    for pattern in EIGHT_PUZZLE_PATTERNS:
+        table = eight_puzzle_table(pattern)
+        print("eight puzzle tiles %s: %d entries, at most %d moves" % (pattern, table.size,
+                                                                        table[table < UNREACHABLE].max()))
+    if options.pieces_file is not None:
+        table = cover_table(options.size[1], options.size[0], PieceList(options.pieces_file))
+        print("cover %s %dx%d: %s entries, at most %d tiles" % (options.pieces_file, options.size[0],
+                                                                  options.size[1], table.shape,
+                                                                  table[table < UNREACHABLE].max()))
+
+
+if __name__ == '__main__':
+    main()
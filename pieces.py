@@ -81,6 +81,11 @@ class Piece(object):
 
         self.num_tiles = len(x_list)
         self.orientations = frozenset(self.orientations)
+        # The order iterating the piece gives its orientations in. Moves and
+        # the placement tables cached on disk number orientations by it, and
+        # a frozenset's own order can change between processes (it depends on
+        # how the set was built, e.g. when unpickled), so it's sorted.
+        self._ordered = tuple(sorted(self.orientations, key=sorted))
 
         self.x = x_list
         self.y = y_list
@@ -96,7 +101,7 @@ class Piece(object):
         return Piece(self.x[0], self.y[0])
 
     def __iter__(self):
-        return self.orientations.__iter__()
+        return iter(self._ordered)
 
     def __str__(self):
         out_str = []
@@ -143,9 +148,11 @@ class PieceList(object):
         ##O##
         """
         self.pieces = []
+        self.path = None
         directory = "layouts"
         if fname is not None:
-            with open(os.path.join(directory, fname)) as f:
+            self.path = os.path.join(directory, fname)
+            with open(self.path) as f:
                 lines = f.read().splitlines()
 
             n = int(lines[0])
@@ -0,0 +1,247 @@
+import os
+
+import numpy as np
+
+import board
+import disk_cache
+
+"""
+Precomputed placement tables. A placement is one orientation of one piece
+at one in-bounds position of the board.
+"""
+
+CACHE_DIR = os.path.join('.cache', 'placements')
+CACHE_VERSION = 2
+
+
+def _pack(cells, num_cells):
+    """
+    Helper function: pack a list of cell numbers into a little-endian bit mask
+    """
+    mask = np.zeros(num_cells, np.bool_)
+    mask[cells] = True
+    return np.packbits(mask, bitorder='little')
+
+
+class PlacementIndex(object):
+    """
+    A PlacementIndex holds every in-bounds placement of a PieceList on a
+    board_w x board_h board. It is built once per (board size, piece list)
+    and shared by every Board of that shape.
+
+    Cells are numbered y * board_w + x. Placements are numbered in the order
+    Board.get_legal_moves_scan generates them (piece, x, y, orientation), so
+    sorting placement ids sorts moves the same way.
+
+    Per placement (one row each):
+    - piece_index, orientation, x, y: the move; orientation indexes list(piece),
+      which is in the same order in every process (see Piece)
+    - tiles: the cells covered, padded with num_cells
+    - tile_mask: the covered cells, as a packed bit mask
+    - neighbour_mask: the in-bounds cells edge-adjacent to a tile
+    - diagonal_mask: the in-bounds cells diagonally adjacent to a tile
+    The masks match the cells Board.add_move updates, and are packed with
+    np.packbits(..., bitorder='little') so bit <cell> of the mask is set iff
+    the cell is in it.
+
+    Per cell:
+    - covering[cell]: an array of the ids of the placements covering it
+
+    Per piece:
+    - piece_start[piece_index]: the id of the piece's first placement; its
+      placements are ids piece_start[piece_index] to
+      piece_start[piece_index + 1] - 1
+
+    bit_masks() returns the same masks as Python ints, for the bitboard, and
+    mask_tables() the tables of Board's shifted-array move generation.
+    """
+
+    _indexes = {}
+
+    def __init__(self, board_w, board_h, piece_list, arrays=None):
+        self.board_w = board_w
+        self.board_h = board_h
+        self.num_cells = board_w * board_h
+        self.piece_list = piece_list
+        if arrays is None:
+            arrays = self._build()
+        self.piece_index = arrays['piece_index']
+        self.orientation = arrays['orientation']
+        self.x = arrays['x']
+        self.y = arrays['y']
+        self.tiles = arrays['tiles']
+        self.tile_mask = arrays['tile_mask']
+        self.neighbour_mask = arrays['neighbour_mask']
+        self.diagonal_mask = arrays['diagonal_mask']
+        self.covering_start = arrays['covering_start']
+        self.covering_ids = arrays['covering_ids']
+
+        self.covering = [self.covering_ids[self.covering_start[c]:self.covering_start[c + 1]]
+                         for c in range(self.num_cells)]
+        self.piece_start = np.searchsorted(self.piece_index, np.arange(piece_list.get_num_pieces() + 1)).tolist()
+        self._bit_masks = None
+        self._mask_tables = None
+        # Moves are shared by every board using this index; nothing mutates them
+        orientations = [list(piece) for piece in piece_list]
+        self.moves = []
+        self._ids = {}
+        for pid, (piece_index, ori_index, x, y) in enumerate(zip(self.piece_index.tolist(), self.orientation.tolist(),
+                                                                 self.x.tolist(), self.y.tolist())):
+            ori = orientations[piece_index][ori_index]
+            self.moves.append(board.Move(piece_list.pieces[piece_index], piece_index, ori, x, y))
+            self._ids[(piece_index, ori, x, y)] = pid
+
+    @classmethod
+    def for_board(cls, board_w, board_h, piece_list):
+        """
+        Return the index for this board size and piece list, building it (or
+        loading it from the disk cache) the first time it's requested.
+        """
+        key = (board_w, board_h, tuple(piece_list.pieces))
+        index = cls._indexes.get(key)
+        if index is None:
+            index = cls._load_or_build(board_w, board_h, piece_list)
+            cls._indexes[key] = index
+        return index
+
+    @classmethod
+    def _cache_path(cls, board_w, board_h, piece_list):
+        """
+        Returns the disk cache file for this index, or None if the piece list
+        wasn't read from a layout file.
+        """
+        return disk_cache.layout_cache_path(CACHE_DIR, '%s.npz', piece_list, CACHE_VERSION, board_w, board_h)
+
+    @classmethod
+    def _load_or_build(cls, board_w, board_h, piece_list):
+        path = cls._cache_path(board_w, board_h, piece_list)
+        if path is not None and os.path.isfile(path):
+            with np.load(path) as arrays:
+                return cls(board_w, board_h, piece_list, dict(arrays))
+        index = cls(board_w, board_h, piece_list)
+        if path is not None:
+            index.save(path)
+        return index
+
+    def save(self, path):
+        """
+        Write the index arrays to <path>. Returns False if they couldn't be
+        written (see disk_cache.save_atomically).
+        """
+        return disk_cache.save_atomically(path, lambda tmp_path: np.savez(
+            tmp_path, piece_index=self.piece_index, orientation=self.orientation, x=self.x, y=self.y,
+            tiles=self.tiles, tile_mask=self.tile_mask, neighbour_mask=self.neighbour_mask,
+            diagonal_mask=self.diagonal_mask, covering_start=self.covering_start, covering_ids=self.covering_ids))
+
+    def _build(self):
+        """
+        Enumerate every in-bounds placement and compute its masks.
+        """
+        w, h = self.board_w, self.board_h
+        max_tiles = max(piece.get_num_tiles() for piece in self.piece_list)
+        rows = []
+        tiles = []
+        tile_masks = []
+        neighbour_masks = []
+        diagonal_masks = []
+        covering = [[] for _ in range(self.num_cells)]
+        for piece_index, piece in enumerate(self.piece_list):
+            orientations = list(piece)
+            for x in range(w):
+                for y in range(h):
+                    for ori_index, ori in enumerate(orientations):
+                        cells = [(xi + x, yi + y) for (xi, yi) in ori]
+                        if any(cx >= w or cy >= h for (cx, cy) in cells):
+                            continue
+                        pid = len(rows)
+                        rows.append((piece_index, ori_index, x, y))
+                        neighbours = set()
+                        diagonals = set()
+                        for (cx, cy) in cells:
+                            covering[cy * w + cx].append(pid)
+                            for (dx, dy) in ((-1, 0), (1, 0), (0, -1), (0, 1)):
+                                if 0 <= cx + dx < w and 0 <= cy + dy < h:
+                                    neighbours.add((cy + dy) * w + cx + dx)
+                            for (dx, dy) in ((-1, -1), (-1, 1), (1, 1), (1, -1)):
+                                if 0 <= cx + dx < w and 0 <= cy + dy < h:
+                                    diagonals.add((cy + dy) * w + cx + dx)
+                        tile_cells = [cy * w + cx for (cx, cy) in cells]
+                        tiles.append(tile_cells + [self.num_cells] * (max_tiles - len(tile_cells)))
+                        tile_masks.append(_pack(tile_cells, self.num_cells))
+                        neighbour_masks.append(_pack(sorted(neighbours), self.num_cells))
+                        diagonal_masks.append(_pack(sorted(diagonals), self.num_cells))
+
+        rows = np.array(rows, np.int16).reshape(-1, 4)
+        num_bytes = (self.num_cells + 7) // 8
+        covering_start = np.zeros(self.num_cells + 1, np.int32)
+        covering_start[1:] = np.cumsum([len(ids) for ids in covering])
+        return {
+            'piece_index': rows[:, 0].copy(),
+            'orientation': rows[:, 1].copy(),
+            'x': rows[:, 2].copy(),
+            'y': rows[:, 3].copy(),
+            'tiles': np.array(tiles, np.int32).reshape(-1, max_tiles),
+            'tile_mask': np.array(tile_masks, np.uint8).reshape(-1, num_bytes),
+            'neighbour_mask': np.array(neighbour_masks, np.uint8).reshape(-1, num_bytes),
+            'diagonal_mask': np.array(diagonal_masks, np.uint8).reshape(-1, num_bytes),
+            'covering_start': covering_start,
+            'covering_ids': np.array([pid for ids in covering for pid in ids], np.int32),
+        }
+
+    def find(self, move):
+        """
+        Return the id of the placement <move> makes, or None if it's not
+        completely in bounds.
+        """
+        return self._ids.get((move.piece_index, move.orientation, move.x, move.y))
+
+    def bit_masks(self):
+        """
+        Return (tile, neighbour, diagonal, covering) lists, where the first
+        three hold each placement's masks as ints (bit <cell> set iff the cell
+        is in the mask) and covering[cell] is a list of placement ids.
+        """
+        if self._bit_masks is None:
+            self._bit_masks = tuple([int.from_bytes(row.tobytes(), 'little') for row in masks]
+                                    for masks in (self.tile_mask, self.neighbour_mask, self.diagonal_mask))
+            self._bit_masks += ([ids.tolist() for ids in self.covering],)
+        return self._bit_masks
+
+    def mask_tables(self):
+        """
+        Return (offsets, orientation_offsets, orientation_piece,
+        orientation_start, pid_grid), where orientations are numbered piece by
+        piece in list(piece) order, orientation_start[piece_index] is the
+        number of the piece's first one, and:
+        - offsets: a (num_offsets, 2) array of every distinct (x, y) tile
+          offset of any orientation
+        - orientation_offsets[o]: the rows of offsets holding orientation o's
+          tiles, padded by repeating its first tile
+        - orientation_piece[o]: the piece index of orientation o
+        - pid_grid[o, y, x]: the id of the placement of orientation o at
+          (x, y), or -1 if it's out of bounds
+        """
+        if self._mask_tables is None:
+            orientations = [sorted(ori) for piece in self.piece_list for ori in piece]
+            offsets = sorted({tile for ori in orientations for tile in ori})
+            rows = {tile: row for row, tile in enumerate(offsets)}
+            max_tiles = self.tiles.shape[1]
+            orientation_offsets = np.array([[rows[tile] for tile in ori] + [rows[ori[0]]] * (max_tiles - len(ori))
+                                            for ori in orientations], np.intp).reshape(-1, max_tiles)
+            counts = [len(list(piece)) for piece in self.piece_list]
+            orientation_piece = np.repeat(np.arange(len(counts)), counts)
+            orientation_start = np.concatenate(([0], np.cumsum(counts)[:-1])).astype(np.intp)
+            pid_grid = np.full((len(orientations), self.board_h, self.board_w), -1, np.int32)
+            pid_grid[orientation_start[self.piece_index] + self.orientation, self.y, self.x] = np.arange(len(self))
+            self._mask_tables = (np.array(offsets, np.intp).reshape(-1, 2), orientation_offsets, orientation_piece,
+                                 orientation_start, pid_grid)
+        return self._mask_tables
+
+    def cells(self, mask):
+        """
+        Return the cell numbers set in a packed <mask> row.
+        """
+        return np.flatnonzero(np.unpackbits(mask, count=self.num_cells, bitorder='little'))
+
+    def __len__(self):
+        return len(self.piece_index)
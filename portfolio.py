@@ -0,0 +1,244 @@
+import json
+import pickle
+import queue
+import time
+
+import blokus_problems
+import pattern_db
+import processes
+import search
+
+"""
+A portfolio of search strategies raced against each other on one problem.
+
+Every strategy runs in its own process (see processes.py). The first one to return a
+solution that reaches a goal wins and the others are stopped; with
+optimal_only, only the strategies that return optimal solutions take part,
+so the winner's is optimal too. Each run is appended to a JSONL stats file,
+to tune the portfolio of each puzzle type from.
+
+A strategy is written 'search_func' or 'search_func:heuristic', e.g.
+'astar:blokus_cover_heuristic'.
+"""
+
+SEARCH_FUNCTIONS = {
+    'dfs': search.dfs,
+    'dfs_in_place': search.dfs_in_place,
+    'bfs': search.bfs,
+    'ucs': search.ucs,
+    'astar': search.astar,
+    'idastar': search.idastar,
+    'smastar': search.smastar,
+}
+
+# The search functions whose solutions are optimal (with an admissible heuristic). bfs is
+# only optimal when every step costs the same, which isn't so for the Blokus puzzles.
+OPTIMAL_SEARCH_FUNCTIONS = ('ucs', 'astar', 'idastar', 'smastar')
+
+DEFAULT_PORTFOLIOS = {
+    'fill': ['dfs_in_place', 'bfs'],
+    'corners': ['astar:blokus_corners_heuristic', 'idastar:blokus_corners_heuristic', 'ucs', 'dfs_in_place'],
+    'cover': ['astar:blokus_cover_heuristic', 'astar:blokus_cover_pdb_heuristic',
+              'idastar:blokus_cover_heuristic', 'ucs', 'dfs_in_place'],
+}
+
+DEFAULT_STATS_FILE = 'portfolio_stats.jsonl'
+
+
+def find_heuristic(name):
+    """
+    Returns the heuristic function called <name> in blokus_problems, pattern_db or search
+    """
+    for module in (blokus_problems, pattern_db, search):
+        if hasattr(module, name):
+            return getattr(module, name)
+    raise ValueError('The heuristic %s was not found.' % name)
+
+
+def parse_strategies(specs, find=find_heuristic):
+    """
+    Returns a list of (name, search function, heuristic or None) for the strategies named
+    in <specs>, looking up heuristics with <find>
+    """
+    strategies = []
+    for spec in specs:
+        func_name, _, heuristic_name = spec.partition(':')
+        if func_name not in SEARCH_FUNCTIONS:
+            raise ValueError('Unknown search function %s in strategy %s' % (func_name, spec))
+        heuristic = find(heuristic_name) if heuristic_name else None
+        if heuristic is not None and func_name not in ('astar', 'idastar', 'smastar'):
+            raise ValueError('%s does not take a heuristic' % func_name)
+        strategies.append((spec, SEARCH_FUNCTIONS[func_name], heuristic))
+    return strategies
+
+
+def is_optimal(strategy):
+    """
+    Returns True if <strategy> always returns an optimal solution
+    """
+    return strategy[0].partition(':')[0] in OPTIMAL_SEARCH_FUNCTIONS
+
+
+def _follow(problem, actions):
+    """
+    Takes <actions> from the start state of <problem> with get_successors, and returns
+    (get_successors' own actions, the last state); None if one of the actions isn't among
+    the successors of the state it's taken in. Actions are matched by value, comparing
+    their pickles when == doesn't: the winner's actions come back from its process as
+    unpickled copies, which actions without a value __eq__ (such as board.Move) aren't
+    equal to.
+    """
+    state = problem.get_start_state()
+    own_actions = []
+    for action in actions:
+        action_key = None
+        for successor, other, _ in problem.get_successors(state):
+            if other == action:
+                break
+            if action_key is None:
+                action_key = pickle.dumps(action)
+            if pickle.dumps(other) == action_key:
+                break
+        else:
+            return None
+        own_actions.append(other)
+        state = successor
+    return own_actions, state
+
+
+def reaches_goal(problem, actions):
+    """
+    Returns True if <actions> take the start state of <problem> to a goal state
+    """
+    if actions is None:
+        return False
+    if not hasattr(problem, 'get_successor'):
+        followed = _follow(problem, actions)
+        return followed is not None and problem.is_goal_state(followed[1])
+    state = problem.get_start_state()
+    for action in actions:
+        try:
+            state = problem.get_successor(state, action)
+        except ValueError:
+            return False
+    return problem.is_goal_state(state)
+
+
+def _run_strategy(strategy, problem, results):
+    name, search_func, heuristic = strategy
+    start = time.perf_counter()
+    actions = search_func(problem) if heuristic is None else search_func(problem, heuristic)
+    results.put((name, actions, getattr(problem, 'expanded', 0), time.perf_counter() - start))
+
+
+def portfolio_search(problem, strategies, optimal_only=False, stats_file=DEFAULT_STATS_FILE, puzzle=None,
+                     timeout=None):
+    """
+    Races <strategies> (see parse_strategies) on <problem> and returns the actions of the
+    winner, or None if none of them found a solution within <timeout> seconds. The winner's
+    expanded node count is left in problem.expanded, and its name in problem.winner.
+
+    A record of the run is appended to <stats_file> (unless it's None): the puzzle, the
+    strategies raced, the winner, its time, cost and expanded nodes, and the strategies
+    that finished without a solution.
+    """
+    if optimal_only:
+        strategies = [strategy for strategy in strategies if is_optimal(strategy)]
+        if not strategies:
+            raise ValueError('None of the strategies is optimal')
+    context = processes.get_context()
+    results = context.Queue()
+    workers = [context.Process(target=_run_strategy, args=(strategy, problem, results))
+               for strategy in strategies]
+    start = time.perf_counter()
+    for process in workers:
+        process.start()
+
+    winner = None
+    failed = []
+    try:
+        while winner is None and len(failed) < len(workers):
+            wait = 0.1
+            if timeout is not None:
+                wait = min(wait, timeout - (time.perf_counter() - start))
+                if wait <= 0:
+                    break
+            try:
+                name, actions, expanded, elapsed = results.get(True, wait)
+            except queue.Empty:
+                if all(process.exitcode is not None for process in workers) and results.empty():
+                    break  # the others crashed
+                continue
+            if actions is not None and not hasattr(problem, 'get_successor'):
+                # Return get_successors' own actions rather than the unpickled copies
+                followed = _follow(problem, actions)
+                reached = followed is not None and problem.is_goal_state(followed[1])
+                if reached:
+                    actions = followed[0]
+            else:
+                reached = reaches_goal(problem, actions)
+            if reached:
+                winner = (name, actions, expanded, elapsed)
+            else:
+                failed.append(name)
+    finally:
+        for process in workers:
+            process.terminate()
+        for process in workers:
+            process.join()
+
+    record = {
+        'puzzle': puzzle or type(problem).__name__,
+        'strategies': [strategy[0] for strategy in strategies],
+        'optimal_only': optimal_only,
+        'winner': None,
+        'failed': failed,
+        'wall_time': time.perf_counter() - start,
+    }
+    problem.winner = None
+    if winner is not None:
+        name, actions, expanded, elapsed = winner
+        problem.winner = name
+        problem.expanded = expanded
+        record.update(winner=name, time=elapsed, cost=problem.get_cost_of_actions(actions), expanded=expanded)
+    if stats_file is not None:
+        with open(stats_file, 'a') as f:
+            f.write(json.dumps(record) + '\n')
+    return None if winner is None else winner[1]
+
+
+def summarize(stats_file=DEFAULT_STATS_FILE):
+    """
+    Prints how often each strategy won, per puzzle, from the runs recorded in <stats_file>
+    """
+    wins = {}
+    with open(stats_file) as f:
+        for line in f:
+            record = json.loads(line)
+            puzzle_wins = wins.setdefault(record['puzzle'], {})
+            puzzle_wins[record['winner']] = puzzle_wins.get(record['winner'], 0) + 1
+    for puzzle, puzzle_wins in sorted(wins.items()):
+        total = sum(puzzle_wins.values())
+        for name, count in sorted(puzzle_wins.items(), key=lambda item: -item[1]):
+            print("%-10s %-40s %5d %6.1f%%" % (puzzle, name, count, 100.0 * count / total))
+
+
+def main():
+    """
+    Prints the win counts recorded in a stats file.
+    """
+    from optparse import OptionParser
+    usage_str = """
+    USAGE:      python portfolio.py <options>
+    EXAMPLES:   (1) python portfolio.py
+                    - prints how often each strategy won, per puzzle, in portfolio_stats.jsonl
+    """
+    parser = OptionParser(usage_str)
+    parser.add_option('-s', '--stats', dest='stats_file', default=DEFAULT_STATS_FILE,
+                      help='the stats file to summarize')
+    options, _ = parser.parse_args()
+    summarize(options.stats_file)
+
+
+if __name__ == '__main__':
+    main()
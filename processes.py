@@ -0,0 +1,16 @@
+import multiprocessing
+
+"""
+The multiprocessing context every worker process here is started with.
+"""
+
+
+def get_context():
+    """
+    Returns the multiprocessing context to start worker processes with: fork
+    where the platform has it, so workers start at once and inherit the
+    parent's caches (placement indexes, Zobrist keys, pattern databases)
+    instead of rebuilding them, and the platform's default (spawn) elsewhere.
+    """
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context('fork' if 'fork' in methods else None)
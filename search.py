@@ -2,6 +2,17 @@
 In search.py, you will implement generic search algorithms
 """
 
+from array import array
+import collections
+import copy
+import heapq
+import itertools
+import queue
+import sys
+import zlib
+
+import processes
+import stats
 import util
 
 
@@ -48,6 +59,35 @@ class SearchProblem:
 		"""
 		util.raiseNotDefined()
 
+	def get_state_key(self, state):
+		"""
+		state: Search state
+
+		Returns a hashable value that is equal for equal states and doesn't change when
+		the state does. The default is the state itself, which is right for immutable states.
+		"""
+		return state
+
+	# Problems may also implement a lazy protocol, which breadth_first_search,
+	# uniform_cost_search and a_star_search use instead of get_successors when it's there,
+	# so that a successor is only built once the search actually needs it:
+	#
+	# get_actions(state): a list of (action, stepCost) pairs for the legal actions from state
+	# get_successor(state, action): returns the state action leads to from state
+	#
+	# Problems whose states can be changed in place may also define the following, which
+	# depth_first_search_in_place uses together with get_actions:
+	#
+	# apply_action(state, action): performs action on state in place
+	# undo_action(state): takes back the last action applied to state
+	#
+	# Problems with a single goal state may define the following for
+	# bidirectional_breadth_first_search:
+	#
+	# get_goal_state(): returns the goal state
+	# get_predecessors(state): a list of (predecessor, action, stepCost) triples, one for each
+	#   state that action leads from to state
+
 
 def depth_first_search(problem):
 	"""
@@ -66,110 +106,380 @@ def depth_first_search(problem):
 	path = []
 	if problem.is_goal_state(problem.get_start_state()):
 		return path
-	visited_states = set()
-	visited_states.add(problem.get_start_state())
+	search_stats = stats.for_problem(problem)
+	visited_keys = set()
+	visited_keys.add(problem.get_state_key(problem.get_start_state()))
 	fringe_stack = problem.get_successors(problem.get_start_state())
+	search_stats.count('expanded')
+	search_stats.count('generated', len(fringe_stack))
 	
 	while len(fringe_stack) != 0:
 		current = fringe_stack.pop()
 		if current is None:
 			path.pop()
 			continue
-		visited_states.add(current[0])  # current[0] is the board object of this node
+		visited_keys.add(problem.get_state_key(current[0]))  # current[0] is the board object of this node
 		if problem.is_goal_state(current[0]):
 			path.append(current[1])  # current[1] is the 'move' object of this node
 			return path
 		successors = problem.get_successors(current[0])
+		search_stats.count('expanded')
+		search_stats.count('generated', len(successors))
 		added = False
 		fringe_stack.append(None)
 		for child in successors:
-			if child[0] not in visited_states:
+			if problem.get_state_key(child[0]) not in visited_keys:
 				added = True
 				fringe_stack.append(child)
+			else:
+				search_stats.count('duplicates')
+		search_stats.peak('peak_fringe', len(fringe_stack))
 		if added:
 			path.append(current[1])
 		else:
 			fringe_stack.pop()  # remove the None we pushed
 
 
+def depth_first_search_in_place(problem):
+	"""
+	Search the deepest nodes in the search tree first, like depth_first_search, but walk a
+	single copy of the start state up and down the tree with problem.apply_action and
+	problem.undo_action instead of keeping a successor state per fringe entry.
+
+	Besides the visited set of state keys, this uses memory proportional to the depth of
+	the search. Returns None if no goal is reachable.
+	"""
+	state = copy.copy(problem.get_start_state())
+	if problem.is_goal_state(state):
+		return []
+	search_stats = stats.for_problem(problem)
+	visited_keys = set()
+	visited_keys.add(problem.get_state_key(state))
+	path = []
+	# Like depth_first_search, try the last successor first
+	pending = [reversed(problem.get_actions(state))]
+	search_stats.count('expanded')
+
+	while len(pending) != 0:
+		next_action = next(pending[-1], None)
+		if next_action is None:
+			# every action from here has been tried; go back up
+			pending.pop()
+			if len(path) != 0:
+				path.pop()
+				problem.undo_action(state)
+			continue
+		action = next_action[0]
+		problem.apply_action(state, action)
+		search_stats.count('generated')
+		key = problem.get_state_key(state)
+		if key in visited_keys:
+			search_stats.count('duplicates')
+			problem.undo_action(state)
+			continue
+		visited_keys.add(key)
+		path.append(action)
+		if problem.is_goal_state(state):
+			return path
+		pending.append(reversed(problem.get_actions(state)))
+		search_stats.count('expanded')
+		search_stats.peak('peak_fringe', len(pending))
+	return None
+
+
+class _NodeStore:
+	"""
+	Every node a search has generated, kept in parallel arrays rather than as objects: node
+	i was reached from node parent[i] by the action with id action_id[i], at cost g[i], and
+	closed[i] is 1 once it has been expanded. g is a list, since step costs may be any kind
+	of number. Node 0 is the start state. ids maps state keys (see
+	SearchProblem.get_state_key) to node ids, and with closed is the search's visited set; a
+	search's fringe only needs to hold node ids.
+
+	A state is only kept while it's needed: a successor built by get_successors waits here
+	until it's popped, and the state of an expanded node stays until all of its successors
+	built with the lazy protocol (get_actions / get_successor) have been popped. Successors
+	built by get_successors are in ids while they wait, so that a state reached again is
+	kept as one node, whose parent and g change if the new path is cheaper.
+
+	Actions are numbered by identity the first time they're seen; the Blokus problems share
+	one Move object per placement, so there are at most as many actions as placements.
+	"""
+
+	def __init__(self, problem):
+		self.problem = problem
+		self.lazy = hasattr(problem, 'get_successor')
+		self.parent = array('l', [-1])
+		self.action_id = array('l', [-1])
+		self.g = [0]
+		self.closed = bytearray(b'\x01')
+		self.ids = {problem.get_state_key(problem.get_start_state()): 0}
+		self.actions = []
+		self._action_ids = {}
+		self._built = {}  # node id: (state, key) for built nodes that haven't been popped
+		self._expanded = {}  # node id: [state, number of its lazy successors not yet popped]
+		self.stats = stats.for_problem(problem)
+
+	def __contains__(self, key):
+		"""
+		Returns True if the state with <key> has been closed
+		"""
+		node_id = self.ids.get(key)
+		return node_id is not None and self.closed[node_id] == 1
+
+	def __len__(self):
+		return len(self.parent)
+
+	def _action_id(self, action):
+		action_id = self._action_ids.get(id(action))
+		if action_id is None:
+			action_id = len(self.actions)
+			self._action_ids[id(action)] = action_id
+			self.actions.append(action)
+		return action_id
+
+	def _add(self, parent_id, action, g):
+		self.parent.append(parent_id)
+		self.action_id.append(self._action_id(action))
+		self.g.append(g)
+		self.closed.append(0)
+		return len(self.parent) - 1
+
+	def expand(self, node_id, state, improve=True):
+		"""
+		Add the successors of <state>, the state of node <node_id>, and return the ids of the
+		nodes to queue. Uses the lazy protocol if the problem implements it, and get_successors
+		if not. In that case successors whose state has been closed are left out, and so are
+		those already waiting as another node - unless <improve> is set and the path through
+		<state> is cheaper: then that node is moved under node_id and its id returned again.
+		"""
+		g = self.g[node_id]
+		self.stats.count('expanded')
+		if self.lazy:
+			first_id = len(self.parent)
+			actions = self.problem.get_actions(state)
+			self.stats.count('generated', len(actions))
+			if len(actions) != 0:
+				self._expanded[node_id] = [state, len(actions)]
+			for action, cost in actions:
+				self._add(node_id, action, g + cost)
+			return range(first_id, len(self.parent))
+
+		child_ids = []
+		successors = self.problem.get_successors(state)
+		self.stats.count('generated', len(successors))
+		for child, action, cost in successors:
+			key = self.problem.get_state_key(child)
+			other_id = self.ids.get(key)
+			if other_id is None:
+				child_id = self._add(node_id, action, g + cost)
+				self._built[child_id] = (child, key)
+				self.ids[key] = child_id
+				child_ids.append(child_id)
+			elif improve and not self.closed[other_id] and g + cost < self.g[other_id]:
+				self.parent[other_id] = node_id
+				self.action_id[other_id] = self._action_id(action)
+				self.g[other_id] = g + cost
+				child_ids.append(other_id)
+			else:
+				self.stats.count('duplicates')
+		return child_ids
+
+	def built_state(self, node_id):
+		"""
+		Returns the state of node <node_id> if it has been built, and None if not
+		"""
+		built = self._built.get(node_id)
+		return None if built is None else built[0]
+
+	def pop_state(self, node_id):
+		"""
+		Returns (state, state key) of node <node_id>, building the state if needed. The store
+		doesn't keep it afterwards; see keep_state.
+		"""
+		built = self._built.pop(node_id, None)
+		if built is not None:
+			return built
+		parent_id = self.parent[node_id]
+		expanded = self._expanded[parent_id]
+		state = self.problem.get_successor(expanded[0], self.actions[self.action_id[node_id]])
+		expanded[1] -= 1
+		if expanded[1] == 0:
+			del self._expanded[parent_id]
+		return state, self.problem.get_state_key(state)
+
+	def keep_state(self, node_id, state, key):
+		"""
+		Keep the popped state of node <node_id> until it's popped again
+		"""
+		self._built[node_id] = (state, key)
+
+	def close(self, node_id, key):
+		self.closed[node_id] = 1
+		if self.lazy:
+			# successors built by get_successors are in ids already
+			self.ids[key] = node_id
+
+	def path(self, node_id):
+		"""
+		Returns the list of actions from the start state to node <node_id>
+		"""
+		move_list = []
+		while node_id != 0:
+			move_list.append(self.actions[self.action_id[node_id]])
+			node_id = self.parent[node_id]
+		return move_list[::-1]
+
+
+# The fringe methods whose calls are timed as queue operations
+_FRINGE_METHODS = ('push', 'pop', 'popWithPriority', 'update')
+
+
+def _priority_fringe(nodes, tie_break=util.fifoTieBreak):
+	"""
+	Returns the priority queue for uniform_cost_search and a_star_search. A waiting node can
+	only be reached again by a cheaper path when successors are built by get_successors (see
+	_NodeStore.expand), so only then is the fringe an IndexedPriorityQueue that can lower its
+	priority. Successors of the lazy protocol go to the plain heap, which is faster.
+	"""
+	if nodes.lazy:
+		fringe = util.PriorityQueue(tie_break)
+	else:
+		fringe = util.IndexedPriorityQueue(tie_break)
+	return nodes.stats.instrument(fringe, _FRINGE_METHODS, 'queue')
+
+
 def breadth_first_search(problem):
 	"""
 	Search the shallowest nodes in the search tree first.
 	"""
-	path = []
 	if problem.is_goal_state(problem.get_start_state()):
-		return path
-	visited_states = set()
-	visited_states.add(problem.get_start_state())
-	fringe = []
-	successors = problem.get_successors(problem.get_start_state())
-	for s in successors:
-		fringe.append((s, None))
-	while len(fringe):
-		current = fringe.pop(0)  # a tuple of (child, parent_index) where child is a 3-value tuple
-		if current[0][0] not in visited_states:
-			path.append(current)
-			visited_states.add(current[0][0])
-			parent_index = len(path) - 1
-			if problem.is_goal_state(current[0][0]):
+		return []
+	nodes = _NodeStore(problem)
+	fringe = nodes.stats.instrument(util.Queue(), _FRINGE_METHODS, 'queue')
+	for child_id in nodes.expand(0, problem.get_start_state(), improve=False):
+		fringe.push(child_id)
+	closed_id = 0
+	while not fringe.isEmpty():
+		node_id = fringe.pop()
+		current, key = nodes.pop_state(node_id)
+		if key not in nodes:
+			nodes.close(node_id, key)
+			closed_id = node_id
+			if problem.is_goal_state(current):
 				# return path
 				break
-			successors = problem.get_successors(current[0][0])
-			for child in successors:
-				if child[0] not in visited_states:
-					fringe.append((child, parent_index))
-	
-	goal = path[-1]
-	parent_index = goal[1]
-	move_list = [goal[0][1]]  # goal[child][move]
-	while parent_index is not None:
-		cur = path[parent_index]  # a tuple of (child, parent_index) where child is a 3-value tuple
-		move_list.append(cur[0][1])
-		parent_index = cur[1]
-	return move_list[::-1]
+			for child_id in nodes.expand(node_id, current, improve=False):
+				fringe.push(child_id)
+			nodes.stats.peak('peak_fringe', len(fringe))
+		else:
+			nodes.stats.count('duplicates')
+
+	return nodes.path(closed_id)
+
+
+def bidirectional_breadth_first_search(problem):
+	"""
+	Search breadth first from the start state and, backwards, from the goal state at the
+	same time, a whole layer at a time on the side with the smaller frontier, until the two
+	searches meet. The path found has the fewest actions; it's only the cheapest if all the
+	step costs are equal.
+
+	The problem has to have a single goal state and define get_goal_state and
+	get_predecessors (see SearchProblem).
+	"""
+	start = problem.get_start_state()
+	goal = problem.get_goal_state()
+	start_key = problem.get_state_key(start)
+	goal_key = problem.get_state_key(goal)
+	if start_key == goal_key:
+		return []
+	# key: (key of the state it was reached from, action) on each side
+	forward_parents = {start_key: None}
+	backward_parents = {goal_key: None}
+	forward_frontier = [start]
+	backward_frontier = [goal]
+	search_stats = stats.for_problem(problem)
+
+	while forward_frontier and backward_frontier:
+		forward = len(forward_frontier) <= len(backward_frontier)
+		if forward:
+			frontier, parents, others = forward_frontier, forward_parents, backward_parents
+			expand = problem.get_successors
+		else:
+			frontier, parents, others = backward_frontier, backward_parents, forward_parents
+			expand = problem.get_predecessors
+		next_frontier = []
+		meeting = None
+		for state in frontier:
+			key = problem.get_state_key(state)
+			search_stats.count('expanded')
+			for neighbour, action, _ in expand(state):
+				search_stats.count('generated')
+				neighbour_key = problem.get_state_key(neighbour)
+				if neighbour_key in parents:
+					search_stats.count('duplicates')
+					continue
+				parents[neighbour_key] = (key, action)
+				if neighbour_key in others:
+					# Every meeting found in this layer makes a path of the same length
+					meeting = neighbour_key
+					break
+				next_frontier.append(neighbour)
+			if meeting is not None:
+				break
+		if meeting is not None:
+			path = []
+			key = meeting
+			while forward_parents[key] is not None:
+				key, action = forward_parents[key]
+				path.append(action)
+			path.reverse()
+			key = meeting
+			while backward_parents[key] is not None:
+				key, action = backward_parents[key]
+				path.append(action)
+			return path
+		if forward:
+			forward_frontier = next_frontier
+		else:
+			backward_frontier = next_frontier
+		search_stats.peak('peak_fringe', len(forward_frontier) + len(backward_frontier))
+	return None
 
 
 def uniform_cost_search(problem):
 	"""
 	Search the node of least total cost first.
 	"""
-	path = []
 	if problem.is_goal_state(problem.get_start_state()):
-		return path
-	state_dict = dict()
-	visited_states = set()
-	visited_states.add(problem.get_start_state())
-	fringe = util.PriorityQueue()
-	successors = problem.get_successors(problem.get_start_state())
-	for s in successors:
-		cost = problem.get_cost_of_actions([s[1]])
-		state_dict[s[0]] = (s, None, cost)
-		fringe.push(s[0], cost)
+		return []
+	nodes = _NodeStore(problem)
+	fringe = _priority_fringe(nodes)
+	for child_id in nodes.expand(0, problem.get_start_state()):
+		fringe.push(child_id, nodes.g[child_id])
+	closed_id = 0
 	while not fringe.isEmpty():
-		current = fringe.pop()  # object of type board
-		if current not in visited_states:
-			data_for_current = state_dict[current]  # state_dict[current] is a tuple (child, parent_index, cost_from_root)
-			path.append(data_for_current)
-			visited_states.add(current)
-			parent_index = len(path) - 1
+		node_id = fringe.pop()
+		current, key = nodes.pop_state(node_id)
+		if key not in nodes:
+			nodes.close(node_id, key)
+			closed_id = node_id
 			if problem.is_goal_state(current):
 				# return path
 				break
-			successors = problem.get_successors(current)
-			for child in successors:
-				if child[0] not in visited_states:
-					cost = problem.get_cost_of_actions([child[1]]) + data_for_current[2]
-					state_dict[child[0]] = (child, parent_index, cost)
-					fringe.push(child[0], cost)
-	
-	goal = path[-1]
-	parent_index = goal[1]
-	move_list = [goal[0][1]]  # goal[child][move]
-	while parent_index is not None:
-		cur = path[parent_index]  # a tuple of (child, parent_index) where child is a 3-value tuple
-		move_list.append(cur[0][1])
-		parent_index = cur[1]
-	return move_list[::-1]
+			first_id = len(nodes)
+			for child_id in nodes.expand(node_id, current):
+				if child_id < first_id:
+					# a waiting node that was just given a cheaper path
+					fringe.update(child_id, nodes.g[child_id])
+				else:
+					fringe.push(child_id, nodes.g[child_id])
+			nodes.stats.peak('peak_fringe', len(fringe))
+		else:
+			nodes.stats.count('duplicates')
+
+	return nodes.path(closed_id)
 
 
 def null_heuristic(state, problem=None):
@@ -180,51 +490,648 @@ def null_heuristic(state, problem=None):
 	return 0
 
 
-def a_star_search(problem, heuristic=null_heuristic):
+class MemoizedHeuristic:
+	"""
+	Wraps a heuristic function with a cache of its values for the <size> states it was
+	most recently asked about, keyed by problem.get_state_key, so that a state reached from
+	several parents is only evaluated once. hits and misses count the calls answered from
+	the cache and the calls passed on to the heuristic.
+	"""
+
+	def __init__(self, heuristic, size=1 << 16):
+		self.heuristic = heuristic
+		self.size = size
+		self.cache = collections.OrderedDict()
+		self.hits = 0
+		self.misses = 0
+		self.__name__ = getattr(heuristic, '__name__', type(heuristic).__name__)
+
+	def __call__(self, state, problem):
+		key = problem.get_state_key(state)
+		value = self.cache.get(key)
+		if value is not None:
+			self.hits += 1
+			self.cache.move_to_end(key)
+			return value
+		self.misses += 1
+		value = self.heuristic(state, problem)
+		if self.size > 0:
+			self.cache[key] = value
+			if len(self.cache) > self.size:
+				self.cache.popitem(last=False)
+		return value
+
+
+# The ways a_star_search can break ties between nodes of equal f
+TIE_BREAKS = ('deeper', 'lower_h', 'fifo', 'lifo')
+
+
+def a_star_search(problem, heuristic=null_heuristic, tie_break='deeper'):
 	"""
 	Search the node that has the lowest combined cost and heuristic first.
+
+	For problems that implement the lazy protocol, successors are pushed before they're
+	built, with h(parent) - stepCost standing in for their heuristic (a lower bound on it
+	when the heuristic is consistent). When such a node is popped it's built, and pushed
+	again if its real f value is higher, so nodes are still expanded in order of f.
+
+	tie_break (one of TIE_BREAKS) picks between nodes of equal f: 'deeper' expands the one
+	of highest g first, 'lower_h' the one of lowest h (as estimated above until it's built),
+	and 'fifo' and 'lifo' the one pushed first and last.
 	"""
-	path = []
 	if problem.is_goal_state(problem.get_start_state()):
-		return path
-	state_dict = dict()
-	visited_states = set()
-	visited_states.add(problem.get_start_state())
-	fringe = util.PriorityQueue()
-	successors = problem.get_successors(problem.get_start_state())
-	for s in successors:
-		cost = problem.get_cost_of_actions([s[1]])
-		state_dict[s[0]] = (s, None, cost)
-		fringe.push(s[0], cost + heuristic(s[0], problem))
+		return []
+	nodes = _NodeStore(problem)
+	heuristic = nodes.stats.wrap(heuristic, 'heuristic')
+	g_values = nodes.g
+	# The heuristic value per node id, None until it's computed
+	h_values = [heuristic(problem.get_start_state(), problem)]
+
+	def estimated_h(node_id):
+		h = h_values[node_id]
+		if h is None:
+			parent_id = nodes.parent[node_id]
+			h = max(h_values[parent_id] - (g_values[node_id] - g_values[parent_id]), 0)
+		return h
+
+	tie_breaks = {
+		'deeper': util.preferHigher(g_values.__getitem__),
+		'lower_h': util.preferLower(estimated_h),
+		'fifo': util.fifoTieBreak,
+		'lifo': util.lifoTieBreak,
+	}
+	fringe = _priority_fringe(nodes, tie_breaks[tie_break])
+
+	def push_children(node_id, state):
+		for child_id in nodes.expand(node_id, state):
+			if child_id < len(h_values):
+				# a waiting node that was just given a cheaper path; its h is known
+				fringe.update(child_id, g_values[child_id] + h_values[child_id])
+				continue
+			child_state = nodes.built_state(child_id)
+			h_values.append(None if child_state is None else heuristic(child_state, problem))
+			fringe.push(child_id, g_values[child_id] + estimated_h(child_id))
+
+	push_children(0, problem.get_start_state())
+	closed_id = 0
 	while not fringe.isEmpty():
-		current = fringe.pop()  # object of type board
-		if current not in visited_states:
-			data_for_current = state_dict[current]  # state_dict[current] is a tuple (child, parent_index, cost_from_root)
-			path.append(data_for_current)
-			visited_states.add(current)
-			parent_index = len(path) - 1
-			if problem.is_goal_state(current):
-				# return path
+		node_id, f = fringe.popWithPriority()
+		current, key = nodes.pop_state(node_id)
+		if key in nodes:
+			nodes.stats.count('duplicates')
+			continue
+		if h_values[node_id] is None:
+			h_values[node_id] = heuristic(current, problem)
+			if g_values[node_id] + h_values[node_id] > f:
+				# built just now, and its real f value is higher: queue it again
+				nodes.keep_state(node_id, current, key)
+				fringe.push(node_id, g_values[node_id] + h_values[node_id])
+				continue
+		nodes.close(node_id, key)
+		closed_id = node_id
+		if problem.is_goal_state(current):
+			# return path
+			break
+		push_children(node_id, current)
+		nodes.stats.peak('peak_fringe', len(fringe))
+
+	return nodes.path(closed_id)
+
+
+class _TranspositionTable:
+	"""
+	A fixed-size table of the lowest cost at which iterative_deepening_a_star_search has
+	reached each state in the current iteration, used to cut off paths that reach a state
+	again at no lower cost. Each state has one slot, picked by the hash of its key. When two
+	states want the same slot, an entry from an earlier iteration is always replaced, and
+	otherwise the state reached at the lower cost keeps it: cutting that one off saves the
+	larger subtree.
+	"""
+
+	def __init__(self, size):
+		self.size = size
+		self.keys = [None] * size
+		self.g = [0] * size
+		self.iterations = [-1] * size
+		self.iteration = 0
+
+	def next_iteration(self):
+		self.iteration += 1
+
+	def seen(self, key, g):
+		"""
+		Returns True if the state with <key> has been reached at a cost of at most <g> in this
+		iteration. If not, records that it's been reached at cost <g>, if the replacement
+		policy lets it, and returns False.
+		"""
+		slot = hash(key) % self.size
+		current = self.iterations[slot] == self.iteration
+		if current and self.keys[slot] == key:
+			if self.g[slot] <= g:
+				return True
+		elif current and self.g[slot] < g:
+			return False
+		self.keys[slot] = key
+		self.g[slot] = g
+		self.iterations[slot] = self.iteration
+		return False
+
+
+def iterative_deepening_a_star_search(problem, heuristic=null_heuristic, table_size=1 << 16):
+	"""
+	Search like a_star_search, but depth first: each iteration explores the paths whose f
+	value is at most a threshold, starting with h of the start state and raising it to the
+	lowest f value that went over it, until a goal is found. Returns None if no goal is
+	reachable.
+
+	Memory use is proportional to the depth of the search, plus a transposition table of
+	<table_size> entries (see _TranspositionTable). Problems that implement the in-place
+	protocol (apply_action / undo_action) are searched on a single copy of the start state.
+	"""
+	start = problem.get_start_state()
+	in_place = hasattr(problem, 'apply_action')
+	state = copy.copy(start) if in_place else start
+	table = _TranspositionTable(table_size)
+	path = []
+	search_stats = stats.for_problem(problem)
+	heuristic = search_stats.wrap(heuristic, 'heuristic')
+
+	def bounded_search(state, g, h, threshold):
+		"""
+		Returns True if a goal was found, in which case path leads to it, and otherwise the
+		lowest f value over threshold below <state>
+		"""
+		if g + h > threshold:
+			return g + h
+		if problem.is_goal_state(state):
+			return True
+		if in_place:
+			successors = [(None, action, cost) for action, cost in problem.get_actions(state)]
+		else:
+			successors = problem.get_successors(state)
+		search_stats.count('expanded')
+		# The path below the start state is the search's fringe
+		search_stats.peak('peak_fringe', len(path) + 1)
+		next_threshold = float('inf')
+		for child, action, cost in successors:
+			# A lower bound on the child's f value, as in a_star_search: if it's over the
+			# threshold, the child needn't be built
+			bound = g + cost + max(h - cost, 0)
+			if bound > threshold:
+				next_threshold = min(next_threshold, bound)
+				continue
+			if in_place:
+				problem.apply_action(state, action)
+				child = state
+			search_stats.count('generated')
+			result = None
+			if table.seen(problem.get_state_key(child), g + cost):
+				search_stats.count('duplicates')
+			else:
+				path.append(action)
+				result = bounded_search(child, g + cost, heuristic(child, problem), threshold)
+				if result is True:
+					return True
+				path.pop()
+			if in_place:
+				problem.undo_action(state)
+			if result is not None:
+				next_threshold = min(next_threshold, result)
+		return next_threshold
+
+	start_h = heuristic(start, problem)
+	threshold = start_h
+	while threshold != float('inf'):
+		table.next_iteration()
+		table.seen(problem.get_state_key(state), 0)
+		result = bounded_search(state, 0, start_h, threshold)
+		if result is True:
+			return path
+		threshold = result
+	return None
+
+
+class _SMANode:
+	"""
+	A node of simplified_memory_bounded_a_star_search's search tree. Once the node is
+	expanded, each of its children is either in memory, in children, or forgotten, in which
+	case forgotten keeps the child's backed-up f value. For problems with the lazy protocol,
+	state and key are None until the node is first popped.
+	"""
+	__slots__ = ('state', 'key', 'parent', 'action', 'g', 'h', 'f', 'depth', 'children', 'forgotten',
+				 'expanded', 'alive', 'version')
+
+	def __init__(self, parent, action, g, f, depth):
+		self.state = None
+		self.key = None
+		self.parent = parent
+		self.action = action
+		self.g = g
+		self.h = 0
+		self.f = f
+		self.depth = depth
+		self.children = {}
+		self.forgotten = {}
+		self.expanded = False
+		self.alive = True
+		self.version = 0
+
+	def lowest_forgotten_f(self):
+		return min(self.forgotten.values(), default=float('inf'))
+
+	def backed_up_f(self):
+		"""
+		The lowest f value known for a goal below this node, once it has no children in memory
+		"""
+		return max(self.f, self.lowest_forgotten_f()) if self.expanded else self.f
+
+
+def memory_budget(max_mb, state):
+	"""
+	Returns roughly how many search nodes holding states like <state> fit in <max_mb>
+	megabytes: the state's size is the sizes of the object and of its attributes, which
+	counts numpy arrays' data but not objects the states share, such as the piece list.
+	"""
+	state_size = sys.getsizeof(state) + sum(sys.getsizeof(value) for value in getattr(state, '__dict__', {}).values())
+	# The node itself, its entries in its parent's dicts, the keys dict and the two heaps
+	node_size = sys.getsizeof(_SMANode(None, None, 0, 0, 0)) + 500
+	return max(int(max_mb * 2 ** 20) // (state_size + node_size), 2)
+
+
+def simplified_memory_bounded_a_star_search(problem, heuristic=null_heuristic, max_nodes=None, max_mb=None):
+	"""
+	Search like a_star_search, but keep at most <max_nodes> nodes in memory (or as many as fit
+	in <max_mb> megabytes, see memory_budget; 100000 if neither is given). When memory is
+	full, the leaf with the highest f value (the shallowest, on ties) is forgotten and its f
+	value is backed up into its parent, which regenerates it when that value becomes the lowest
+	one left.
+
+	The result is optimal as long as the memory can hold the path to the goal; paths that
+	can't fit are given up on, so a budget that's too small returns None instead of running out
+	of memory. The closer the budget is to that, the more often the same nodes are regenerated.
+	The number of nodes forgotten and regenerated are left in problem.forgotten and
+	problem.regenerated.
+	"""
+	start = problem.get_start_state()
+	if max_nodes is None:
+		max_nodes = 100000 if max_mb is None else memory_budget(max_mb, start)
+	lazy = hasattr(problem, 'get_actions')
+	infinity = float('inf')
+	counter = itertools.count()
+
+	# Nodes to expand, or to regenerate forgotten children of, lowest f and deepest first
+	best = []
+	# Nodes without children in memory, highest f and shallowest first
+	worst = []
+	# The built node of each state in memory
+	in_memory = {}
+	problem.forgotten = problem.regenerated = 0
+	search_stats = stats.for_problem(problem)
+	heuristic = search_stats.wrap(heuristic, 'heuristic')
+
+	def queue(node):
+		# Heap entries of earlier versions of the node are skipped when they come up
+		node.version += 1
+		priority = node.lowest_forgotten_f() if node.expanded else node.f
+		if priority != infinity or not node.expanded:
+			heapq.heappush(best, (priority, -node.depth, next(counter), node.version, node))
+		if not node.children and node.parent is not None:
+			heapq.heappush(worst, (-node.backed_up_f(), node.depth, next(counter), node.version, node))
+
+	def build(node, state):
+		"""
+		Give <node> its state; returns False if the state is in memory already, on a path
+		that's as cheap
+		"""
+		node.state = state
+		node.key = problem.get_state_key(state)
+		other = in_memory.get(node.key)
+		if other is not None and other.g <= node.g:
+			search_stats.count('duplicates')
+			return False
+		in_memory[node.key] = node
+		node.h = heuristic(state, problem)
+		node.f = max(node.f, node.g + node.h)
+		return True
+
+	def make_children(node, limit=None):
+		"""
+		Make the children of <node>, or when regenerating, the forgotten ones whose f value
+		is at most <limit>
+		"""
+		forgotten = node.forgotten
+		made = []
+		if lazy:
+			successors = ((None, action, cost) for action, cost in problem.get_actions(node.state))
+		else:
+			successors = problem.get_successors(node.state)
+		for child, action, cost in successors:
+			if limit is None:
+				if node.depth + 2 > max_nodes:
+					# The path through this child can't be continued without forgetting it
+					f = infinity
+				else:
+					# As in a_star_search, a lower bound until the child is built
+					f = max(node.f, node.g + cost + max(node.h - cost, 0))
+			else:
+				f = forgotten.get(action, infinity)
+				if f > limit:
+					continue
+				del forgotten[action]
+			child_node = _SMANode(node, action, node.g + cost, f, node.depth + 1)
+			node.children[action] = child_node
+			search_stats.count('generated')
+			if child is not None and not build(child_node, child):
+				del node.children[action]
+				forgotten[action] = infinity
+				continue
+			made.append(child_node)
+		return made
+
+	def back_up(node):
+		"""
+		Raise the f values of <node> and its ancestors to the lowest f value of their
+		children, including the forgotten ones
+		"""
+		while node is not None and node.expanded:
+			f = min(min((child.f for child in node.children.values()), default=infinity),
+					node.lowest_forgotten_f())
+			if f <= node.f:
 				break
-			successors = problem.get_successors(current)
-			for child in successors:
-				if child[0] not in visited_states:
-					cost = problem.get_cost_of_actions([child[1]]) + data_for_current[2]
-					state_dict[child[0]] = (child, parent_index, cost)
-					fringe.push(child[0], cost + heuristic(child[0], problem))
-
-	goal = path[-1]
-	parent_index = goal[1]
-	move_list = [goal[0][1]]  # goal[child][move]
-	while parent_index is not None:
-		cur = path[parent_index]  # a tuple of (child, parent_index) where child is a 3-value tuple
-		move_list.append(cur[0][1])
-		parent_index = cur[1]
-	return move_list[::-1]
+			node.f = f
+			if not node.children:
+				queue(node)
+			node = node.parent
+
+	def drop(node, f):
+		"""
+		Take <node> out of memory, leaving <f> as its f value in its parent
+		"""
+		parent = node.parent
+		del parent.children[node.action]
+		parent.forgotten[node.action] = f
+		if node.key is not None and in_memory.get(node.key) is node:
+			del in_memory[node.key]
+		node.alive = False
+		node.state = None
+		queue(parent)
+		back_up(parent)
+
+	root = _SMANode(None, None, 0, 0, 0)
+	build(root, start)
+	queue(root)
+	size = 1
+	while best:
+		priority, _, _, version, node = heapq.heappop(best)
+		if version != node.version or not node.alive:
+			continue
+		if priority == infinity:
+			break
+		if node.state is None:
+			if not build(node, problem.get_successor(node.parent.state, node.action)):
+				# Reached at no lower cost elsewhere: the parent needn't regenerate it
+				drop(node, infinity)
+				size -= 1
+				continue
+			if node.f > priority:
+				queue(node)
+				back_up(node.parent)
+				continue
+		if not node.expanded:
+			if problem.is_goal_state(node.state):
+				path = []
+				while node.parent is not None:
+					path.append(node.action)
+					node = node.parent
+				return path[::-1]
+			node.expanded = True
+			search_stats.count('expanded')
+			children = make_children(node)
+		else:
+			children = make_children(node, priority)
+			problem.regenerated += len(children)
+			search_stats.count('regenerated', len(children))
+		size += len(children)
+		queue(node)
+		for child in children:
+			queue(child)
+		back_up(node)
+
+		while size > max_nodes and worst:
+			_, _, _, version, leaf = heapq.heappop(worst)
+			if version != leaf.version or not leaf.alive:
+				continue
+			drop(leaf, leaf.backed_up_f())
+			size -= 1
+			problem.forgotten += 1
+			search_stats.count('forgotten')
+		# The nodes in memory are SMA*'s fringe
+		search_stats.peak('peak_fringe', size)
+
+		if len(best) + len(worst) > 4 * size + 1000:
+			# Drop the outdated entries, which would otherwise outgrow the nodes
+			best = [entry for entry in best if entry[3] == entry[4].version and entry[4].alive]
+			worst = [entry for entry in worst if entry[3] == entry[4].version and entry[4].alive]
+			heapq.heapify(best)
+			heapq.heapify(worst)
+	return None
+
+
+# Fields of the counters hash_distributed_a_star_search's processes share: messages sent and
+# received, followed by one flag per worker that's set while the worker has nothing to do
+_SENT, _RECEIVED, _IDLE = 0, 1, 2
+
+
+def _hda_owner(key, num_workers):
+	"""
+	Returns the worker of hash_distributed_a_star_search that owns the state with <key>.
+	Tuple keys are placed by their first item (the Blokus boards' Zobrist hash), bytes keys
+	by their crc32, and other keys by hash(), which the workers agree on when they're forked
+	from the same process (see processes.get_context).
+	"""
+	if isinstance(key, tuple):
+		key = key[0]
+	if isinstance(key, bytes):
+		return zlib.crc32(key) % num_workers
+	# hash() of a small int is the int itself: mix its bits before taking the remainder
+	return (((hash(key) * 0x9E3779B97F4A7C15) & 0xFFFFFFFFFFFFFFFF) >> 32) % num_workers
+
+
+def _hda_worker(worker, problem, heuristic, inboxes, results, lock, counts, incumbent, done):
+	"""
+	One process of hash_distributed_a_star_search: an A* search over the states it owns, fed
+	by the nodes the other workers send it. A node is a (g, h, state, state key, path) tuple,
+	where h is h(parent) - stepCost until the node is popped, as in a_star_search.
+	"""
+	num_workers = len(inboxes)
+	lazy = hasattr(problem, 'get_actions')
+	counter = itertools.count()
+	expanded_before = getattr(problem, 'expanded', 0)
+	hits_before, misses_before = getattr(heuristic, 'hits', 0), getattr(heuristic, 'misses', 0)
+	fringe = []
+	best_g = {}
+
+	def add(g, h, state, key, path, built=False):
+		if best_g.get(key, g + 1) <= g and not built:
+			return
+		best_g[key] = g
+		if g + h < incumbent.value:
+			heapq.heappush(fringe, (g + h, -g, next(counter), built, h, state, key, path))
+
+	def receive(block):
+		try:
+			nodes = inboxes[worker].get(block, 0.01)
+		except queue.Empty:
+			return
+		with lock:
+			counts[_RECEIVED] += 1
+			counts[_IDLE + worker] = 0
+		for node in nodes:
+			add(*node)
+
+	def successors(state):
+		if lazy:
+			return [(problem.get_successor(state, action), action, cost)
+					for action, cost in problem.get_actions(state)]
+		return problem.get_successors(state)
+
+	while not done.is_set():
+		while not inboxes[worker].empty():
+			receive(False)
+		if fringe and fringe[0][0] >= incumbent.value:
+			# nothing left that could lead to a cheaper goal
+			fringe = []
+		if not fringe:
+			with lock:
+				counts[_IDLE + worker] = 1
+			receive(True)
+			continue
+
+		f, neg_g, _, built, h, state, key, path = heapq.heappop(fringe)
+		g = -neg_g
+		if best_g[key] < g:
+			continue
+		if not built:
+			h = heuristic(state, problem)
+			if g + h > f:
+				# its real f value is higher: queue it again
+				add(g, h, state, key, path, True)
+				continue
+		if problem.is_goal_state(state):
+			with lock:
+				if g < incumbent.value:
+					incumbent.value = g
+					results.put(('goal', g, list(path)))
+			continue
+
+		outgoing = [[] for _ in range(num_workers)]
+		for child, action, cost in successors(state):
+			if g + cost >= incumbent.value:
+				continue
+			child_key = problem.get_state_key(child)
+			owner = _hda_owner(child_key, num_workers)
+			node = (g + cost, max(h - cost, 0), child, child_key, path + (action,))
+			if owner == worker:
+				add(*node)
+			else:
+				outgoing[owner].append(node)
+		batches = [(owner, nodes) for owner, nodes in enumerate(outgoing) if nodes]
+		if batches:
+			# counted before they're sent, so that they're never in flight uncounted
+			with lock:
+				counts[_SENT] += len(batches)
+			for owner, nodes in batches:
+				inboxes[owner].put(nodes)
+
+	results.put(('counts', getattr(problem, 'expanded', 0) - expanded_before,
+				 getattr(heuristic, 'hits', 0) - hits_before, getattr(heuristic, 'misses', 0) - misses_before))
+
+
+def hash_distributed_a_star_search(problem, heuristic=null_heuristic, num_workers=2):
+	"""
+	Search like a_star_search in <num_workers> processes (HDA*). Every state is owned by one
+	worker, picked by a hash of its state key (see _hda_owner); a worker expands the states it
+	owns lowest f first and sends each successor to its owner's queue, batched per owner, so
+	duplicates are detected by the owner without sharing a visited set.
+
+	Since the workers don't expand nodes in global f order, the first goal found need not be
+	the cheapest. The cost of the cheapest goal found so far is shared, and nodes whose f
+	isn't lower are dropped; a state reached again on a cheaper path is opened again. The
+	search ends once every worker is idle and every message sent has been received, which this
+	process checks on the shared counters under one lock. The cheapest goal found then is
+	optimal if the heuristic is admissible.
+
+	States, actions and state keys are sent between processes, so they must be picklable; the
+	problem and heuristic are not, as the workers are forked (where the platform can fork).
+	Expanded nodes are counted per worker and their total is added to problem.expanded, and so
+	are a MemoizedHeuristic's hits and misses. Returns None if there's no solution.
+	"""
+	start = problem.get_start_state()
+	if problem.is_goal_state(start):
+		return []
+	context = processes.get_context()
+	inboxes = [context.Queue() for _ in range(num_workers)]
+	results = context.Queue()
+	lock = context.Lock()
+	counts = context.RawArray('q', _IDLE + num_workers)
+	incumbent = context.RawValue('d', float('inf'))
+	done = context.Event()
+
+	start_key = problem.get_state_key(start)
+	counts[_SENT] = 1
+	inboxes[_hda_owner(start_key, num_workers)].put([(0, 0, start, start_key, ())])
+	workers = [context.Process(target=_hda_worker, args=(worker, problem, heuristic, inboxes, results, lock,
+														  counts, incumbent, done), daemon=True)
+			   for worker in range(num_workers)]
+	for process in workers:
+		process.start()
+
+	best = None
+	try:
+		while True:
+			try:
+				message = results.get(True, 0.01)
+				if best is None or message[1] < best[1]:
+					best = message
+			except queue.Empty:
+				pass
+			with lock:
+				if counts[_SENT] == counts[_RECEIVED] and all(counts[_IDLE:]):
+					break
+			for process in workers:
+				if process.exitcode is not None:
+					raise RuntimeError('HDA* worker exited with code %d' % process.exitcode)
+	except BaseException:
+		for process in workers:
+			process.terminate()
+		raise
+	done.set()
+
+	counts = [0, 0, 0]
+	reported = 0
+	while reported < num_workers:
+		message = results.get()
+		if message[0] == 'counts':
+			counts = [total + count for total, count in zip(counts, message[1:])]
+			reported += 1
+		elif best is None or message[1] < best[1]:
+			best = message
+	for process in workers:
+		process.join()
+	for obj, name, count in ((problem, 'expanded', counts[0]), (heuristic, 'hits', counts[1]),
+							 (heuristic, 'misses', counts[2])):
+		if hasattr(obj, name):
+			setattr(obj, name, getattr(obj, name) + count)
+	return None if best is None else best[2]
 
 
 # Abbreviations
 bfs = breadth_first_search
+bibfs = bidirectional_breadth_first_search
 dfs = depth_first_search
+dfs_in_place = depth_first_search_in_place
+hdastar = hash_distributed_a_star_search
 astar = a_star_search
+idastar = iterative_deepening_a_star_search
+smastar = simplified_memory_bounded_a_star_search
 ucs = uniform_cost_search
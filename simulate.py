@@ -0,0 +1,160 @@
+import json
+import random
+import statistics
+import time
+
+from displays import NoDisplay
+from game import BOARD_CLASSES, GameEngine
+from inputs import RandomInput
+from pieces import PieceList
+import processes
+
+"""
+Headless, seeded four-player self-play, to track the engine's throughput.
+
+Game i is played by four RandomInput players sharing random.Random(seed + i),
+so a run replays exactly, whatever the number of processes it's split over.
+"""
+
+NUM_PLAYERS = 4
+
+# Set up in each worker process by _init_worker
+_worker = {}
+
+
+def play_game(seed, board_w, board_h, piece_list, board_class):
+    """
+    Plays one game with <seed> on a NoDisplay and returns (scores, number of moves)
+    """
+    rng = random.Random(seed)
+    inputs = [RandomInput(rng) for _ in range(NUM_PLAYERS)]
+    engine = GameEngine(inputs, board_w, board_h, piece_list, board_class, NoDisplay())
+    while not engine.all_players_passed():
+        engine.play_turn()
+    return engine.score, int((~engine.board.pieces).sum())
+
+
+def fastest_board_class(board_w, board_h, piece_list, seed=0, repeat=3):
+    """
+    Returns the name of the BOARD_CLASSES entry that plays a seeded game fastest, taking the
+    best of <repeat> games per class. Each class first plays a game that isn't timed, to
+    build the tables it shares between boards (placement masks, bit masks...).
+    """
+    times = {}
+    for name, board_class in BOARD_CLASSES.items():
+        play_game(seed, board_w, board_h, piece_list, board_class)
+        for _ in range(repeat):
+            start = time.perf_counter()
+            play_game(seed, board_w, board_h, piece_list, board_class)
+            times[name] = min(times.get(name, float('inf')), time.perf_counter() - start)
+    return min(times, key=times.get)
+
+
+def _init_worker(board_w, board_h, pieces_file, board_name):
+    _worker['args'] = (board_w, board_h, PieceList(pieces_file), BOARD_CLASSES[board_name])
+
+
+def _play_seeded(seed):
+    return play_game(seed, *_worker['args'])
+
+
+def simulate(num_games, board_w, board_h, pieces_file, board_name, seed=0, jobs=1):
+    """
+    Plays <num_games> games, seeded seed, seed + 1, ..., in this process or in a pool of
+    <jobs> processes, and returns a dict of the run's throughput and score distributions. A
+    player wins each game they have the top score in, ties included.
+    """
+    start = time.perf_counter()
+    seeds = range(seed, seed + num_games)
+    if jobs > 1:
+        context = processes.get_context()
+        with context.Pool(jobs, _init_worker, (board_w, board_h, pieces_file, board_name)) as pool:
+            games = pool.map(_play_seeded, seeds)
+    else:
+        _init_worker(board_w, board_h, pieces_file, board_name)
+        games = [_play_seeded(game_seed) for game_seed in seeds]
+    elapsed = time.perf_counter() - start
+
+    num_moves = sum(moves for _, moves in games)
+    wins = [0] * NUM_PLAYERS
+    for scores, _ in games:
+        best = max(scores)
+        for player, score in enumerate(scores):
+            wins[player] += score == best
+    players = []
+    for player in range(NUM_PLAYERS):
+        scores = [game_scores[player] for game_scores, _ in games]
+        players.append({
+            'mean': statistics.mean(scores),
+            'stdev': statistics.pstdev(scores),
+            'min': min(scores),
+            'median': statistics.median(scores),
+            'max': max(scores),
+            'wins': wins[player],
+        })
+    return {
+        'games': num_games,
+        'board': board_name,
+        'size': [board_w, board_h],
+        'pieces': pieces_file,
+        'seed': seed,
+        'jobs': jobs,
+        'seconds': elapsed,
+        'games_per_sec': num_games / elapsed,
+        'moves_per_sec': num_moves / elapsed,
+        'moves_per_game': num_moves / float(num_games),
+        'players': players,
+    }
+
+
+def main():
+    """
+    Processes the command used to run a simulation from the command line.
+    """
+    from optparse import OptionParser
+    usage_str = """
+    USAGE:      python simulate.py <options>
+    EXAMPLES:   (1) python simulate.py -n 100
+                    - plays 100 seeded games on a 20x20 board and reports the throughput
+                (2) python simulate.py -n 1000 -j 4 -o run.json
+                    - plays them in 4 processes and saves the report
+    """
+    parser = OptionParser(usage_str)
+    parser.add_option('-n', '--games', dest='games', type='int', default=100,
+                      help='the number of games to play')
+    parser.add_option('-p', '--pieces', dest='pieces_file', default='valid_pieces.txt',
+                      help='the file to read for the list of pieces')
+    parser.add_option('-s', '--board-size', dest='size', type='int', nargs=2, default=(20, 20),
+                      help='the size of the game board')
+    parser.add_option('-b', '--board', dest='board', type='choice', choices=['auto'] + sorted(BOARD_CLASSES),
+                      default='auto', help='board representation; auto picks the one that plays a game fastest')
+    parser.add_option('-j', '--jobs', dest='jobs', type='int', default=1,
+                      help='the number of processes to play the games in')
+    parser.add_option('--seed', dest='seed', type='int', default=0,
+                      help='the seed of the first game')
+    parser.add_option('-o', '--output', dest='output', default=None,
+                      help='a JSON file to save the report to')
+
+    options, _ = parser.parse_args()
+    board_w, board_h = options.size[1], options.size[0]
+    board_name = options.board
+    if board_name == 'auto':
+        board_name = fastest_board_class(board_w, board_h, PieceList(options.pieces_file))
+    report = simulate(options.games, board_w, board_h, options.pieces_file, board_name, options.seed, options.jobs)
+
+    print("%d games on %s (%s), %d process(es): %.2f s" % (report['games'], options.pieces_file, board_name,
+                                                           report['jobs'], report['seconds']))
+    print("games/sec: %.2f, moves/sec: %.1f, moves/game: %.1f" % (report['games_per_sec'], report['moves_per_sec'],
+                                                                   report['moves_per_game']))
+    print("%-7s %7s %7s %5s %7s %5s %6s" % ('player', 'mean', 'stdev', 'min', 'median', 'max', 'wins'))
+    for player, dist in enumerate(report['players']):
+        print("%-7d %7.2f %7.2f %5d %7.1f %5d %6d" % (player + 1, dist['mean'], dist['stdev'], dist['min'],
+                                                      dist['median'], dist['max'], dist['wins']))
+    if options.output is not None:
+        with open(options.output, 'w') as f:
+            json.dump(report, f, indent=2)
+            f.write('\n')
+
+
+if __name__ == '__main__':
+    main()
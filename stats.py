@@ -0,0 +1,175 @@
+import contextlib
+import functools
+import json
+import time
+
+"""
+Counters and timers for a search run, so that a slow run shows where its time
+goes without a profiler.
+
+A problem carries its SearchStats in problem.stats once enable() gives it one;
+the searches in search.py find it with for_problem() and record what they do
+into it. Problems without one get NULL_STATS, which records nothing and costs
+next to nothing, so searches can always report to for_problem(problem).
+"""
+
+# The counters every SearchStats reports, in summary order
+COUNTERS = ('expanded', 'generated', 'duplicates', 'peak_fringe')
+
+# The problem methods enable() times, and the timer each is recorded under
+PROBLEM_TIMERS = (
+    ('legal_moves', 'get_legal_moves'),
+    ('get_successors', 'get_successors'),
+    ('get_successor', 'do_move'),
+    ('apply_action', 'do_move'),
+    ('get_state_key', 'state_key'),
+)
+
+
+class SearchStats(object):
+    """
+    The counters and timers of one search run.
+
+    counters maps a counter name to its value: expanded and generated nodes,
+    duplicates (successors of states that were reached already, dropped or
+    skipped when popped) and peak_fringe, the most nodes the fringe held.
+    timers maps a timer name to [total seconds, calls]. Timers can nest: time
+    spent in get_legal_moves inside get_successors counts towards both.
+    """
+
+    def __init__(self):
+        self.counters = dict.fromkeys(COUNTERS, 0)
+        self.timers = {}
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def peak(self, name, value):
+        """
+        Raises counter <name> to <value> if it's lower
+        """
+        if value > self.counters.get(name, 0):
+            self.counters[name] = value
+
+    def add_time(self, name, seconds, calls=1):
+        timer = self.timers.get(name)
+        if timer is None:
+            self.timers[name] = [seconds, calls]
+        else:
+            timer[0] += seconds
+            timer[1] += calls
+
+    @contextlib.contextmanager
+    def timed(self, name):
+        """
+        A context manager that adds the time spent in its body to timer <name>
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - start)
+
+    def wrap(self, func, name):
+        """
+        Returns <func> with every call timed under timer <name>
+        """
+        add_time = self.add_time
+        perf_counter = time.perf_counter
+
+        @functools.wraps(func)
+        def timed_func(*args, **kwargs):
+            start = perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                add_time(name, perf_counter() - start)
+        return timed_func
+
+    def instrument(self, obj, methods, name):
+        """
+        Times the calls of <obj>'s <methods> that it has under timer <name>, by replacing
+        them on the instance, and returns <obj>
+        """
+        for method in methods:
+            if hasattr(obj, method):
+                setattr(obj, method, self.wrap(getattr(obj, method), name))
+        return obj
+
+    def to_dict(self):
+        return {
+            'counters': dict(self.counters),
+            'timers': {name: {'seconds': seconds, 'calls': calls} for name, (seconds, calls) in self.timers.items()},
+        }
+
+    def save(self, path, **info):
+        """
+        Writes the stats, and the fields of <info> (the puzzle, search function...) to <path>
+        as JSON
+        """
+        record = dict(info)
+        record.update(self.to_dict())
+        with open(path, 'w') as f:
+            json.dump(record, f, indent=2)
+            f.write('\n')
+
+    def summary(self):
+        """
+        Returns a table of the counters and of the timers, slowest first, with each timer's
+        share of the 'search' timer when there is one
+        """
+        lines = ["%-16s %12s" % ('counter', 'value')]
+        lines += ["%-16s %12d" % (name, value) for name, value in self.counters.items()]
+        total = self.timers.get('search', [0])[0]
+        lines.append('')
+        lines.append("%-16s %10s %12s %12s %8s" % ('timer', 'calls', 'total s', 'per call us', '% search'))
+        for name, (seconds, calls) in sorted(self.timers.items(), key=lambda item: -item[1][0]):
+            share = "%7.1f%%" % (100.0 * seconds / total) if total else '-'
+            lines.append("%-16s %10d %12.4f %12.2f %8s" % (name, calls, seconds, 1e6 * seconds / max(calls, 1), share))
+        return '\n'.join(lines)
+
+
+class NullStats(SearchStats):
+    """
+    Stats that record nothing: what searches report to when the problem has no stats
+    """
+
+    def count(self, name, n=1):
+        pass
+
+    def peak(self, name, value):
+        pass
+
+    def add_time(self, name, seconds, calls=1):
+        pass
+
+    def timed(self, name):
+        return contextlib.nullcontext()
+
+    def wrap(self, func, name):
+        return func
+
+    def instrument(self, obj, methods, name):
+        return obj
+
+
+NULL_STATS = NullStats()
+
+
+def for_problem(problem):
+    """
+    Returns the stats of <problem>, NULL_STATS if it has none
+    """
+    return getattr(problem, 'stats', NULL_STATS)
+
+
+def enable(problem):
+    """
+    Gives <problem> a new SearchStats, timing its PROBLEM_TIMERS methods, and returns it
+    """
+    search_stats = SearchStats()
+    for method, name in PROBLEM_TIMERS:
+        if hasattr(problem, method):
+            setattr(problem, method, search_stats.wrap(getattr(problem, method), name))
+    problem.stats = search_stats
+    return search_stats
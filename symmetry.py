@@ -0,0 +1,86 @@
+import numpy as np
+
+"""
+Symmetries of the (rectangular) board, used to let a search treat states
+that are mirror images or rotations of each other as one state.
+
+Cells are (row, col) pairs, like the starting points and cover targets.
+"""
+
+# name: (maps cell (r, c) of an h x w board, maps an h x w array, square boards only)
+_SYMMETRIES = {
+    'identity': (lambda r, c, h, w: (r, c), lambda a: a, False),
+    'rot90': (lambda r, c, h, w: (w - 1 - c, r), lambda a: np.rot90(a, 1), True),
+    'rot180': (lambda r, c, h, w: (h - 1 - r, w - 1 - c), lambda a: np.rot90(a, 2), False),
+    'rot270': (lambda r, c, h, w: (c, h - 1 - r), lambda a: np.rot90(a, 3), True),
+    'flip_rows': (lambda r, c, h, w: (h - 1 - r, c), lambda a: a[::-1, :], False),
+    'flip_cols': (lambda r, c, h, w: (r, w - 1 - c), lambda a: a[:, ::-1], False),
+    'transpose': (lambda r, c, h, w: (c, r), lambda a: a.T, True),
+    'anti_transpose': (lambda r, c, h, w: (w - 1 - c, h - 1 - r), lambda a: a[::-1, ::-1].T, True),
+}
+
+
+def board_symmetries(board_w, board_h):
+    """
+    Returns the names of the symmetries of a board_w x board_h board: all 8
+    for a square board, and the identity, the half turn and the two flips
+    otherwise.
+    """
+    return [name for name, (_, _, square_only) in _SYMMETRIES.items()
+            if board_w == board_h or not square_only]
+
+
+def transform_point(name, point, board_w, board_h):
+    """
+    Returns the cell symmetry <name> maps the (row, col) <point> to.
+    """
+    return _SYMMETRIES[name][0](point[0], point[1], board_h, board_w)
+
+
+def transform_array(name, array):
+    """
+    Returns (a view of) the board_h x board_w <array> transformed by symmetry <name>.
+    """
+    return _SYMMETRIES[name][1](array)
+
+
+def fixing_symmetries(symmetries, board_w, board_h, points=(), point_sets=()):
+    """
+    Returns the symmetries in <symmetries> that map each cell in <points> to
+    itself and each collection of cells in <point_sets> onto itself.
+    """
+    result = []
+    for name in symmetries:
+        if any(transform_point(name, p, board_w, board_h) != tuple(p) for p in points):
+            continue
+        if any({transform_point(name, p, board_w, board_h) for p in s} != {tuple(p) for p in s}
+               for s in point_sets):
+            continue
+        result.append(name)
+    return result
+
+
+# (symmetries, board_h, board_w): the flat cell indices of the board's state
+# array in the order each of the symmetries reads them; see canonical_key
+_gather_indices = {}
+
+
+def canonical_key(board, symmetries):
+    """
+    Returns a key for <board> that is the same for every board it can be
+    turned into by one of <symmetries>: the smallest of the transformed state
+    arrays' bytes, followed by the pieces left (which no symmetry changes).
+    All the transformed arrays are gathered at once, as the rows of one
+    array, so the cost per symmetry is a slice of its bytes.
+    """
+    board_h, board_w = board.state.shape
+    cache_key = (tuple(symmetries), board_h, board_w)
+    indices = _gather_indices.get(cache_key)
+    if indices is None:
+        cells = np.arange(board_h * board_w).reshape(board_h, board_w)
+        indices = np.array([transform_array(name, cells).ravel() for name in symmetries])
+        _gather_indices[cache_key] = indices
+    size = board_h * board_w
+    transformed = board.state.take(indices).tobytes()
+    state_bytes = min([transformed[i:i + size] for i in range(0, len(transformed), size)])
+    return state_bytes + board.pieces.tobytes()
@@ -0,0 +1,115 @@
+import numpy as np
+
+from board import Board
+
+
+class TrackedBoard(Board):
+    """
+    A TrackedBoard is a Board that keeps each player's legal placements up to
+    date as moves are added, instead of finding them again on every
+    get_legal_moves call.
+
+    A move only changes the legality of the placements near it:
+    - every player loses the placements covering its tiles
+    - the mover loses the placements covering the cells edge-adjacent to its
+      tiles, and every placement of the piece it used
+    - the mover gains the legal placements covering the cells diagonally
+      adjacent to its tiles that it attaches
+    Those are found from the PlacementIndex covering lists.
+
+    On top of the Board fields it stores:
+    - _legal_ids: per player, a bool array over the placement ids, True for
+      the player's legal placements, or None until get_legal_moves is first
+      called for them (or after add_starting_point changes their anchors).
+      The arrays are never changed in place, only replaced, so copies of the
+      board share them.
+    - _legal_ids_journal: _legal_ids as it was before each move performed
+      with apply(), for undo()
+    """
+
+    def __init__(self, board_w, board_h, num_players, piece_list, starting_point=(0, 0)):
+        Board.__init__(self, board_w, board_h, num_players, piece_list, starting_point)
+        self._legal_ids = [None] * num_players
+        self._legal_ids_journal = []
+
+    def add_starting_point(self, player, starting_point):
+        Board.add_starting_point(self, player, starting_point)
+        self._legal_ids[player] = None
+
+    def add_move(self, player, move):
+        attached = self.connected[player].copy()
+        num_tiles = Board.add_move(self, player, move)
+        self._update_legal_ids(player, move, np.flatnonzero(self.connected[player] & ~attached))
+        return num_tiles
+
+    def _update_legal_ids(self, player, move, new_corners):
+        """
+        Helper function: update the tracked legal placements after <player>'s
+        <move> was added and attached the cells <new_corners>; the legal
+        placements covering cells that were attached before are tracked
+        already.
+        """
+        index = self.placements
+        pid = index.find(move)
+        tiles = index.tiles[pid, :move.piece.get_num_tiles()].tolist()
+        taken = np.concatenate([index.covering[cell] for cell in tiles])
+        for other, legal_ids in enumerate(self._legal_ids):
+            if legal_ids is None or other == player:
+                continue
+            legal_ids = legal_ids.copy()
+            legal_ids[taken] = False
+            self._legal_ids[other] = legal_ids
+
+        legal_ids = self._legal_ids[player]
+        if legal_ids is None:
+            return
+        legal_ids = legal_ids.copy()
+        blocked = [taken] + [index.covering[cell] for cell in index.cells(index.neighbour_mask[pid]).tolist()]
+        legal_ids[np.concatenate(blocked)] = False
+        legal_ids[index.piece_start[move.piece_index]:index.piece_start[move.piece_index + 1]] = False
+
+        legal = self._legal[player].ravel()
+        anchors = new_corners[legal[new_corners]].tolist()
+        if anchors:
+            candidates = np.concatenate([index.covering[cell] for cell in anchors])
+            candidates = candidates[self.pieces[player][index.piece_index[candidates]]]
+            # The tiles array is padded with an out-of-board cell that is always legal
+            legal = np.append(legal, True)
+            legal_ids[candidates[legal[index.tiles[candidates]].all(axis=1)]] = True
+        self._legal_ids[player] = legal_ids
+
+    def apply(self, player, move):
+        legal_ids = self._legal_ids[:]
+        num_tiles = Board.apply(self, player, move)
+        self._legal_ids_journal.append(legal_ids)
+        return num_tiles
+
+    def undo(self):
+        Board.undo(self)
+        self._legal_ids = self._legal_ids_journal.pop()
+
+    def get_legal_moves(self, player):
+        """
+        Returns a list of legal moves for given player for this board state,
+        the same, and in the same order, as Board.get_legal_moves
+        """
+        legal_ids = self._legal_ids[player]
+        if legal_ids is None:
+            legal_ids = np.zeros(len(self.placements), np.bool_)
+            legal_ids[self._legal_placement_ids(player)] = True
+            self._legal_ids[player] = legal_ids
+        index = self.placements
+        return [index.moves[pid] for pid in np.flatnonzero(legal_ids).tolist()]
+
+    def __getstate__(self):
+        # The tracked placements are rebuilt on demand after unpickling
+        state = Board.__getstate__(self)
+        state['_legal_ids'] = [None] * self.num_players
+        state['_legal_ids_journal'] = []
+        return state
+
+    def __copy__(self):
+        cpy_board = Board.__copy__(self)
+        cpy_board._legal_ids = self._legal_ids[:]
+        cpy_board._legal_ids_journal = []
+        return cpy_board
@@ -9,6 +9,7 @@
 import sys
 import inspect
 import heapq, random
+from collections import deque
 
 """
  Data structures useful for implementing SearchAgents
@@ -38,23 +39,52 @@ class Queue:
     "A container with a first-in-first-out (FIFO) queuing policy."
 
     def __init__(self):
-        self.list = []
+        self.list = deque()
 
     def push(self, item):
         "Enqueue the 'item' into the queue"
-        self.list.insert(0, item)
+        self.list.append(item)
 
     def pop(self):
         """
           Dequeue the earliest enqueued item still in the queue. This
           operation removes the item from the queue.
         """
-        return self.list.pop()
+        return self.list.popleft()
 
     def isEmpty(self):
         "Returns true if the queue is empty"
         return len(self.list) == 0
 
+    def __len__(self):
+        return len(self.list)
+
+
+def fifoTieBreak(item, count):
+    "Among items of equal priority, the one pushed first comes out first"
+    return count
+
+
+def lifoTieBreak(item, count):
+    "Among items of equal priority, the one pushed last comes out first"
+    return -count
+
+
+def preferLower(valueFunction):
+    """
+      Returns a tie-break under which, among items of equal priority, the
+      one with the lowest valueFunction(item) comes out first
+    """
+    return lambda item, count: valueFunction(item)
+
+
+def preferHigher(valueFunction):
+    """
+      Returns a tie-break under which, among items of equal priority, the
+      one with the highest valueFunction(item) comes out first
+    """
+    return lambda item, count: -valueFunction(item)
+
 
 class PriorityQueue:
     """
@@ -66,29 +96,157 @@ class PriorityQueue:
       Note that this PriorityQueue does not allow you to change the priority
       of an item.  However, you may insert the same item multiple times with
       different priorities.
+
+      Items of equal priority come out in the order given by tieBreak: a
+      function of (item, count), count being the number of items pushed
+      before, whose lowest value comes out first. The default, fifoTieBreak,
+      is first in first out; see also lifoTieBreak, preferLower and
+      preferHigher. Items themselves are never compared.
     """
 
-    def __init__(self):
+    def __init__(self, tieBreak=fifoTieBreak):
         self.heap = []
-        self.init = False
+        self.count = 0
+        self.tieBreak = tieBreak
 
     def push(self, item, priority):
-        if not self.init:
-            self.init = True
-            try:
-                item < item
-            except:
-                item.__class__.__lt__ = lambda x, y: (True)
-        pair = (priority, item)
-        heapq.heappush(self.heap, pair)
+        if self.tieBreak is fifoTieBreak:
+            entry = (priority, self.count, item)
+        else:
+            entry = (priority, self.tieBreak(item, self.count), self.count, item)
+        self.count += 1
+        heapq.heappush(self.heap, entry)
 
     def pop(self):
-        (priority, item) = heapq.heappop(self.heap)
-        return item
+        return heapq.heappop(self.heap)[-1]
+
+    def popWithPriority(self):
+        "Removes the item of lowest priority and returns (item, priority)"
+        entry = heapq.heappop(self.heap)
+        return entry[-1], entry[0]
 
     def isEmpty(self):
         return len(self.heap) == 0
 
+    def __len__(self):
+        return len(self.heap)
+
+
+class IndexedPriorityQueue:
+    """
+      A binary heap that also records where each item is in it, so the
+      priority of an item already in the queue can be changed in O(log n)
+      with update(). This is the decrease-key operation PriorityQueue
+      lacks: instead of inserting an item again, a search can lower the
+      priority it was queued with.
+
+      Each item is in the queue at most once, and must be hashable.
+      Items of equal priority come out in the order given by tieBreak, as
+      in PriorityQueue; an item whose priority is updated counts as pushed
+      again.
+    """
+
+    def __init__(self, tieBreak=fifoTieBreak):
+        self.items = []  # the heap, as two parallel lists
+        self.priorities = []  # of (priority, tie-break value) pairs
+        self.positions = {}  # item: its index in the heap
+        self.count = 0
+        self.tieBreak = tieBreak
+
+    def _key(self, item, priority):
+        key = (priority, self.tieBreak(item, self.count))
+        self.count += 1
+        return key
+
+    def push(self, item, priority):
+        "Adds 'item', which must not be in the queue, with 'priority'"
+        key = self._key(item, priority)
+        self.items.append(item)
+        self.priorities.append(key)
+        self._siftUp(len(self.items) - 1, item, key)
+
+    def update(self, item, priority):
+        """
+          Adds 'item' with 'priority' if it isn't in the queue, and
+          changes its priority to 'priority' if it is.
+        """
+        index = self.positions.get(item)
+        if index is None:
+            self.push(item, priority)
+            return
+        key = self._key(item, priority)
+        if key < self.priorities[index]:
+            self._siftUp(index, item, key)
+        else:
+            self._siftDown(index, item, key)
+
+    def pop(self):
+        "Removes and returns the item of lowest priority"
+        return self.popWithPriority()[0]
+
+    def popWithPriority(self):
+        "Removes the item of lowest priority and returns (item, priority)"
+        items, priorities = self.items, self.priorities
+        top = (items[0], priorities[0][0])
+        del self.positions[top[0]]
+        item = items.pop()
+        key = priorities.pop()
+        if len(items) != 0:
+            self._siftDown(0, item, key)
+        return top
+
+    def getPriority(self, item):
+        "Returns the priority 'item' is queued with"
+        return self.priorities[self.positions[item]][0]
+
+    def isEmpty(self):
+        return len(self.items) == 0
+
+    def __len__(self):
+        return len(self.items)
+
+    def __contains__(self, item):
+        return item in self.positions
+
+    def _siftUp(self, index, item, priority):
+        "Moves the hole at 'index' up until 'item' with 'priority' fits in it"
+        items, priorities, positions = self.items, self.priorities, self.positions
+        while index > 0:
+            parent = (index - 1) >> 1
+            parent_priority = priorities[parent]
+            if not priority < parent_priority:
+                break
+            parent_item = items[parent]
+            items[index] = parent_item
+            priorities[index] = parent_priority
+            positions[parent_item] = index
+            index = parent
+        items[index] = item
+        priorities[index] = priority
+        positions[item] = index
+
+    def _siftDown(self, index, item, priority):
+        "Moves the hole at 'index' down until 'item' with 'priority' fits in it"
+        items, priorities, positions = self.items, self.priorities, self.positions
+        size = len(items)
+        child = 2 * index + 1
+        while child < size:
+            child_priority = priorities[child]
+            if child + 1 < size and priorities[child + 1] < child_priority:
+                child += 1
+                child_priority = priorities[child]
+            if not child_priority < priority:
+                break
+            child_item = items[child]
+            items[index] = child_item
+            priorities[index] = child_priority
+            positions[child_item] = index
+            index = child
+            child = 2 * index + 1
+        items[index] = item
+        priorities[index] = priority
+        positions[item] = index
+
 
 class PriorityQueueWithFunction(PriorityQueue):
     """